@@ -0,0 +1,126 @@
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from constants import (HEADERS, COOKIES_TIMEOUT, COUNTRIES_CODES, API_TIMEOUT, API_RETRIES, API_BACKOFF,
+                       API_MAX_BACKOFF, API_RETRY_STATUSES)
+from exceptions import ApiException, CookiesTimeoutException, CookiesExtractionFailedException
+from instrumentation import span, count
+from scheduler import RateLimiter
+
+COUNTRIES_NAMES = {name.lower(): code for code, name in COUNTRIES_CODES.items()}
+
+
+def extract_cookies(driver, timeout: float = COOKIES_TIMEOUT):
+    # The session cookies may be set a little after the redirect from the login page
+    start_time = time.time()
+    while True:
+        try:
+            cookies = driver.get_cookies()
+        except Exception as e:
+            raise CookiesExtractionFailedException(f'Не удалось получить cookies из браузера [{e.__class__.__name__}]')
+        if cookies:
+            return {cookie['name']: cookie['value'] for cookie in cookies}
+        if time.time() - start_time > timeout:
+            raise CookiesTimeoutException('Не удалось дождаться cookies авторизации')
+        time.sleep(0.5)
+
+
+def parse_value(value):
+    return int(value) if value not in (None, '') else None
+
+
+def parse_response(data, country: str):
+    items = data.get('keywords', data.get('rows')) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ApiException('В ответе API нет списка ключевых слов')
+    rows = []
+    for item in items:
+        try:
+            values = {key.lower(): val for key, val in item.items()}
+            rows.append({'Keyword': values['keyword'], 'Country': country,
+                         'Difficulty': parse_value(values.get('difficulty')),
+                         'Volume': parse_value(values.get('volume'))})
+        except (AttributeError, KeyError, TypeError, ValueError):
+            raise ApiException(f'Неверный формат строки в ответе API: {item}')
+    return rows
+
+
+class ApiClient:
+    # One keep-alive connection pool shared by all the workers; the pool is as large as the concurrency
+    def __init__(self, url: str, cookies: dict, workers: int = None, retries: int = API_RETRIES,
+                 backoff: float = API_BACKOFF, timeout: float = API_TIMEOUT):
+        self.url = url
+        self.workers = max(1, workers or int(os.getenv('api_workers', 4)))
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update(HEADERS)
+        self.session.cookies.update(cookies)
+
+    def request(self, payload: dict):
+        for attempt in range(self.retries + 1):
+            delay = min(self.backoff * 2 ** attempt, API_MAX_BACKOFF)
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e.__class__.__name__
+            else:
+                if response.status_code in (401, 403):
+                    raise ApiException(f'Сессия API недействительна, нужна повторная авторизация '
+                                       f'[HTTP {response.status_code}]')
+                if response.status_code not in API_RETRY_STATUSES:
+                    if not response.ok:
+                        raise ApiException(f'Запрос к API завершился с ошибкой [HTTP {response.status_code}]')
+                    try:
+                        return response.json()
+                    except ValueError:
+                        raise ApiException('Ответ API не является JSON')
+                error = f'HTTP {response.status_code}'
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = min(int(retry_after), API_MAX_BACKOFF)
+            if attempt < self.retries:
+                count('api_retries')
+                time.sleep(delay)
+        raise ApiException(f'Не удалось получить ответ API за {self.retries + 1} попыток [{error}]')
+
+    def fetch(self, country: str, phrases: list, row_limit: int):
+        code = COUNTRIES_NAMES.get(country.lower())
+        if code is None:
+            raise ApiException(f'Неизвестная страна {country}')
+        with span('api_request'):
+            data = self.request({'country': code, 'keywords': phrases, 'limit': row_limit})
+        with span('parse_response'):
+            rows = parse_response(data, country)
+        count('rows_parsed', len(rows))
+        return rows
+
+    def get_data(self, country: str, row_limit: int, chunks: list):
+        for phrases in chunks:
+            yield self.fetch(country, phrases, row_limit)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ApiSession:
+    # Stands in for a browser session in ScrapeScheduler: every worker thread shares the client's pool
+    def __init__(self, client: ApiClient):
+        self.client = client
+        self.rate_limiter = RateLimiter(0, 0)
+
+    def close(self):
+        pass
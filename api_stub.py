@@ -0,0 +1,85 @@
+import json
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+from api import ApiClient
+from exceptions import ApiException
+
+STUB_COOKIES = {'session': 'stub'}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Answers like the keywords API: {"keywords": [{"keyword", "difficulty", "volume"}]} for the posted phrases.
+    # Every fail_every-th request gets 503, a request without the session cookie gets 403
+    protocol_version = 'HTTP/1.1'
+    fail_every = 0
+    requests_count = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status: int, data=None, headers: dict = None):
+        body = json.dumps(data).encode('utf-8') if data is not None else b''
+        self.send_response(status)
+        for key, val in {'Content-Type': 'application/json', 'Content-Length': len(body), **(headers or {})}.items():
+            self.send_header(key, str(val))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        cls = type(self)
+        cls.requests_count += 1
+        if 'session=stub' not in self.headers.get('Cookie', ''):
+            return self.send(403)
+        if cls.fail_every and cls.requests_count % cls.fail_every == 0:
+            return self.send(503, headers={'Retry-After': 0})
+        if payload.get('country') == 'fr':
+            return self.send(200, {'keywords': ['не объект']})
+        self.send(200, {'keywords': [{'keyword': keyword, 'difficulty': len(keyword) % 100,
+                                      'volume': len(keyword) * 10 or None}
+                                     for keyword in payload.get('keywords', [])[:payload.get('limit')]]})
+
+
+def serve(port: int = 0, fail_every: int = 0):
+    handler = type('Handler', (StubHandler,), {'fail_every': fail_every})
+    return ThreadingHTTPServer(('127.0.0.1', port), handler)
+
+
+def check():
+    # ApiClient against the stub: retries on 503, 403 and malformed rows raise ApiException
+    server = serve(fail_every=2)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/keywords'
+    try:
+        with ApiClient(url, STUB_COOKIES, workers=2, backoff=0) as client:
+            rows = [row for chunk in client.get_data('United States', 2, [['a', 'bb', 'ccc'], ['dddd']])
+                    for row in chunk]
+            assert [(row['Keyword'], row['Volume']) for row in rows] == [('a', 10), ('bb', 20), ('dddd', 40)], rows
+            assert server.RequestHandlerClass.requests_count == 3, server.RequestHandlerClass.requests_count
+            for cookies, country in (({}, 'Germany'), (STUB_COOKIES, 'France')):
+                client.session.cookies.clear()
+                client.session.cookies.update(cookies)
+                try:
+                    client.fetch(country, ['a'], 1)
+                except ApiException as e:
+                    print(f'{country}: {e}')
+                else:
+                    raise AssertionError(f'{country}: нет ApiException')
+    finally:
+        server.shutdown()
+    print('OK')
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Локальная заглушка API ключевых слов и проверка ApiClient на ней')
+    parser.add_argument('--serve', type=int, metavar='PORT',
+                        help='только запустить заглушку на порту (api_url=http://127.0.0.1:PORT/)')
+    parser.add_argument('--fail-every', type=int, default=0, help='отвечать 503 на каждый N-й запрос')
+    args = parser.parse_args()
+    if args.serve is None:
+        check()
+    else:
+        print(f'Заглушка API: http://127.0.0.1:{args.serve}/, cookie session=stub')
+        serve(args.serve, args.fail_every).serve_forever()
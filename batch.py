@@ -0,0 +1,83 @@
+import json
+import os
+from argparse import ArgumentParser
+from dotenv import load_dotenv
+from shutil import rmtree
+
+from cache import ExportCache
+from database import open_database
+from browser import open_session
+from general import parse
+from instrumentation import instrumentation, span
+from scheduler import ScrapeScheduler
+from scoring import process_data
+from utils import retrieve_countries, retrieve_phrases, write_phrases_text
+
+
+def load_projects(config_filename: str):
+    with open(config_filename, encoding='utf-8') as f:
+        config = json.load(f)
+    defaults = {key: val for key, val in config.items() if key != 'projects'}
+    projects = []
+    for n, project in enumerate(config.get('projects', []), 1):
+        project = {**defaults, **project}
+        for key in ('phrases', 'countries', 'output'):
+            if key not in project:
+                raise ValueError(f'В проекте {project.get("name", n)} не указан параметр "{key}"')
+        project.setdefault('name', str(n))
+        projects.append(project)
+    return projects
+
+
+def run_project(project: dict, scheduler: ScrapeScheduler, temp_folder: str, cache: ExportCache,
+                resume: bool = False, database=None):
+    countries = {c['Страна']: float(c['Коэффициент']) for c in retrieve_countries(project['countries'])}
+    phrases = retrieve_phrases(project['phrases'])
+    phrases_text_filename = write_phrases_text(phrases, project['phrases'])
+    checkpoint_folder = os.path.join(os.getenv('checkpoint_folder', 'checkpoint'), project['name'])
+    data, filename = parse(list(countries.keys()), int(project.get('row_limit', 5000)), temp_folder,
+                           phrases_text_filename, scheduler.sessions_count, cache, resume, database,
+                           project['output'], scheduler, checkpoint_folder)
+    process_data(data if database is None else database.project(filename), filename, countries, phrases,
+                 float(project.get('vol_k', 1)), float(project.get('dif_k', 1)), project.get('backend'))
+
+
+def main(config_filename: str, resume: bool = False, sessions_count: int = None):
+    projects = load_projects(config_filename)
+    temp_folder = os.getenv('temp_folder', 'temp')
+    if os.path.exists(temp_folder) and not resume:
+        rmtree(temp_folder)
+    os.makedirs(temp_folder, exist_ok=True)
+    sessions_count = sessions_count or int(os.getenv('sessions', 1))
+    cache, database, failed = ExportCache(), open_database(), []
+    # The browsers are started and authorized once and reused by every project in the batch
+    with ScrapeScheduler(sessions_count, lambda number: open_session(number, temp_folder, sessions_count)) \
+            as scheduler:
+        for n, project in enumerate(projects, 1):
+            print(f'\n=== [{n}/{len(projects)}] {project["name"]}: {project["phrases"]} -> {project["output"]}')
+            try:
+                with span('project'):
+                    run_project(project, scheduler, temp_folder, cache, resume, database)
+            except Exception as e:
+                print(f'Проект {project["name"]} завершился с ошибкой: {e.__class__.__name__}: {e}')
+                failed.append(project['name'])
+    print(f'\nГотово проектов: {len(projects) - len(failed)}/{len(projects)}')
+    if failed:
+        print(f'С ошибками: {", ".join(failed)}')
+    return failed
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    parser = ArgumentParser(description='Обработка нескольких проектов подряд в одной авторизованной сессии')
+    parser.add_argument('config', help='JSON со списком "projects" (phrases, countries, output, '
+                                       'vol_k, dif_k, row_limit, backend) и общими значениями по умолчанию')
+    parser.add_argument('--resume', action='store_true',
+                        help='продолжить прерванный запуск, не перезаписывая уже выгруженные страны')
+    parser.add_argument('--sessions', type=int, help='количество параллельных браузеров')
+    parser.add_argument('--report', help='сохранить в JSON время этапов и счётчики')
+    parser.add_argument('--profile', help='сохранить профиль cProfile')
+    args = parser.parse_args()
+    instrumentation.setup(args.report, args.profile)
+    if main(args.config, args.resume, args.sessions):
+        raise SystemExit(1)
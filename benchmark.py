@@ -0,0 +1,144 @@
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+from tempfile import TemporaryDirectory
+
+from constants import COUNTRIES_CODES, COUNTRIES_FIELDNAMES, PHRASES_FIELDNAMES
+from dedup import Deduplicator
+from ingest import list_export_files, iter_exports, read_export, read_temp_export
+from scoring import KeywordIndex, score_phrases, write_outputs
+from utils import retrieve_countries, retrieve_phrases
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+EXPORT_HEADER = ['#', 'Keyword', 'Country', 'Difficulty', 'Volume', 'CPC', 'CPS', 'Parent Keyword', 'Last Update']
+
+
+def generate(folder: str, rows: int, countries_count: int, groups: int = 100, seed: int = 0):
+    # phrases.csv, countries.csv and one ahrefs-like export per country with rows // countries_count keywords each
+    rnd = random.Random(seed)
+    codes = list(COUNTRIES_CODES.items())[:max(1, countries_count)]
+    keywords_count = max(1, rows // len(codes))
+    words = [''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rnd.randint(3, 9))) for _ in range(5000)]
+    keywords = list(dict.fromkeys(' '.join(rnd.sample(words, rnd.randint(1, 4))) for _ in range(keywords_count)))
+    with open(os.path.join(folder, 'phrases.csv'), 'w', encoding='utf-8') as f:
+        f.write(';'.join(PHRASES_FIELDNAMES) + '\n')
+        f.write('\n'.join(f'{keyword};group {rnd.randint(1, groups)}' for keyword in keywords))
+    with open(os.path.join(folder, 'countries.csv'), 'w', encoding='utf-8') as f:
+        f.write(';'.join(COUNTRIES_FIELDNAMES) + '\n')
+        f.write('\n'.join(f'{name};{rnd.choice([0.5, 1, 1.5, 2])}' for _, name in codes))
+    temp_folder = os.path.join(folder, 'temp')
+    os.makedirs(temp_folder)
+    for code, _ in codes:
+        with open(os.path.join(temp_folder, f'{code}-export.csv'), 'w', encoding='utf-8') as f:
+            f.write(','.join(EXPORT_HEADER) + '\n')
+            for i, keyword in enumerate(keywords, 1):
+                difficulty = rnd.randint(0, 100) if rnd.random() > 0.1 else ''
+                volume = int(rnd.paretovariate(1.2) * 10) if rnd.random() > 0.1 else ''
+                f.write(f'{i},{keyword},{code},{difficulty},{volume},{rnd.random():.2f},1.1,{keyword},2021-11-01\n')
+    return temp_folder
+
+
+def children_max_rss():
+    # Peak RSS of the largest finished child process, None where the resource module is missing (Windows)
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return (max_rss if sys.platform == 'darwin' else max_rss * 1024) or None
+
+
+def measure(name: str, func, rows: int, memory: bool = True, processes: bool = False):
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        result = func()
+    seconds = time.perf_counter() - start
+    stage = {'seconds': round(seconds, 6), 'rows': rows,
+             'rows_per_second': round(rows / seconds, 1) if seconds else None}
+    if memory:
+        # A separate traced run: tracemalloc slows the code down too much to time it at the same time
+        del result
+        tracemalloc.start()
+        with redirect_stdout(StringIO()):
+            result = func()
+        stage['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    if processes:
+        # tracemalloc only sees this process: the workers' memory is their peak RSS, measured by the OS
+        stage['worker_max_rss_bytes'] = children_max_rss()
+    print(f'{name}: {stage["seconds"]:.3f} s, {stage["rows_per_second"]} rows/s'
+          + (f', {stage["peak_memory_bytes"] / (1 << 20):.1f} MB' if memory else '')
+          + (f', процессы: {stage["worker_max_rss_bytes"] / (1 << 20):.1f} MB RSS'
+             if stage.get('worker_max_rss_bytes') else ', процессы: не измерено' if processes else ''))
+    return result, stage
+
+
+def run(rows: int, countries_count: int, workers: int = None, backend: str = 'python', memory: bool = True,
+        seed: int = 0):
+    stages = dict()
+    with TemporaryDirectory() as folder:
+        temp_folder = generate(folder, rows, countries_count, seed=seed)
+        files = list_export_files(temp_folder)
+        countries = {c['Страна']: float(c['Коэффициент'])
+                     for c in retrieve_countries(os.path.join(folder, 'countries.csv'))}
+        phrases = retrieve_phrases(os.path.join(folder, 'phrases.csv'))
+        total_rows = len(phrases) * len(countries)
+
+        _, stages['read_export'] = measure('read_export', lambda: [
+            read_export(os.path.join(temp_folder, filename), COUNTRIES_CODES[filename.split('-')[0]])
+            for filename in files], total_rows, memory)
+        _, stages['ingest_single'] = measure('ingest_single', lambda: [
+            read_temp_export(os.path.join(temp_folder, filename)) for filename in files], total_rows, memory)
+        exports, stages['ingest_parallel'] = measure('ingest_parallel', lambda: list(
+            iter_exports(temp_folder, files, workers)), total_rows, memory, processes=True)
+
+        def deduplicate():
+            dedup = Deduplicator()
+            for _, export_rows in exports:
+                dedup.extend(export_rows)
+            return dedup.table
+
+        table, stages['dedup'] = measure('dedup', deduplicate, total_rows, memory)
+        keywords = {ph['Запрос'].lower() for ph in phrases}
+        index, stages['index'] = measure('index', lambda: KeywordIndex(table, keywords), total_rows, memory)
+        if backend == 'numpy':
+            from vectorized import score_phrases as score
+        else:
+            score = score_phrases
+        queries = [ph['Запрос'] for ph in phrases]
+        scored, stages['scoring'] = measure('scoring', lambda: score(queries, index, countries, 1.0, 1.0),
+                                            len(phrases), memory)
+        _, stages['write_outputs'] = measure('write_outputs', lambda: write_outputs(
+            scored, phrases, countries, os.path.join(folder, 'output.csv')), len(phrases), memory)
+    return {'created': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+            'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'params': {'rows': rows, 'countries': countries_count, 'phrases': len(phrases), 'workers': workers,
+                       'backend': backend, 'seed': seed},
+            'stages': stages}
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Замер скорости этапов обработки на синтетических выгрузках')
+    parser.add_argument('--rows', type=int, default=100000, help='общее количество строк во всех выгрузках')
+    parser.add_argument('--countries', type=int, default=10, help='количество стран (1-100)')
+    parser.add_argument('--workers', type=int, help='количество процессов для чтения выгрузок')
+    parser.add_argument('--backend', choices=['python', 'numpy'], default='python')
+    parser.add_argument('--no-memory', action='store_true', help='не замерять пиковое потребление памяти')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark.json', help='JSON-файл для результатов')
+    args = parser.parse_args()
+    report = run(args.rows, args.countries, args.workers, args.backend, not args.no_memory, args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'Результаты сохранены в {args.output}')
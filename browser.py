@@ -0,0 +1,342 @@
+import json
+import os
+import time
+from random import randint
+
+from selenium.webdriver import Chrome, ChromeOptions, ActionChains
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as exp_cond
+from selenium.common.exceptions import (NoSuchElementException, ElementClickInterceptedException,
+                                        ElementNotInteractableException, TimeoutException, WebDriverException)
+
+from constants import *
+from exceptions import *
+from instrumentation import span, count
+from scheduler import ScrapeSession
+from ingest import assert_count_rows, read_export
+from watcher import wait_for_download
+
+
+def get_driver(download_folder: str = '/temp/', profile_folder: str = None):
+    options = ChromeOptions()
+    options.add_argument('--log-level=3')
+    if profile_folder:
+        options.add_argument(f'--user-data-dir={profile_folder}')
+    options.add_experimental_option('prefs', {'download.default_directory': download_folder})
+    # options.add_argument('--headless')
+    return Chrome(options=options)
+
+
+def handle_exception(driver: Chrome, exception_cls, text: str, error_pic_filename: str):
+    count(f'errors.{exception_cls.__name__}')
+    # Parallel sessions save their screenshots under their own names, see open_session
+    error_pic_filename = getattr(driver, 'error_filename', error_pic_filename)
+    driver.save_screenshot(error_pic_filename)
+    return exception_cls(f'{text} (см. {error_pic_filename})')
+
+
+def get_export_rows_count(driver: Chrome):
+    try:
+        rows_count_block = WebDriverWait(driver, ROWS_LOAD_TIMEOUT).until(
+            exp_cond.presence_of_element_located((
+                By.XPATH, '//span[@class="css-a5m6co-text css-p8ym46-fontFamily '
+                          'css-1wmho6b-fontWeight css-18j1nfb-display"]')))
+    except TimeoutException:
+        raise handle_exception(driver, TimeoutException, 'Не удалось получить количество строчек', ERROR_FILENAME)
+    return int(''.join(rows_count_block.text.strip().split()[0].split(',')))
+
+
+def export(driver: Chrome, row_limit: int, download_folder: str = 'temp'):
+    with span('wait_rows_count'):
+        rows_count = get_export_rows_count(driver)
+    try:
+        export_btn = WebDriverWait(driver, LOAD_TIMEOUT).until(
+            exp_cond.presence_of_element_located((
+                By.XPATH, '//button[@class="css-15qe8gh-button css-ykx4dy-buttonFocus '
+                          'css-1emi1z8-buttonWidth css-15kjecu-buttonHeight css-q66qvq-buttonCursor"]')))
+    except TimeoutException:
+        raise handle_exception(driver, TimeoutException,
+                               'Не удалось найти кнопку экспорта', ERROR_FILENAME)
+    ActionChains(driver).move_by_offset(10, 20).perform()
+    start_time = time.time()
+    while time.time() - start_time <= LOAD_TIMEOUT:
+        try:
+            export_btn.click()
+            break
+        except ElementClickInterceptedException:
+            count('export_click_retries')
+    else:
+        raise handle_exception(driver, TimeoutException, 'Не удалось нажать на кнопку экспорта', ERROR_FILENAME)
+    try:
+        input_fields = WebDriverWait(driver, LOAD_TIMEOUT).until(
+            exp_cond.presence_of_all_elements_located((By.XPATH, '//input[@name="export-encoding-options"]/..')))
+    except TimeoutException:
+        raise handle_exception(driver, TimeoutException,
+                               'Не удалось установить кодировку при экспорте', ERROR_FILENAME)
+    input_fields[-1].click()
+    try:
+        row_fields = WebDriverWait(driver, LOAD_TIMEOUT).until(
+            exp_cond.presence_of_all_elements_located((By.XPATH, '//input[@name="export-number-of-rows"]/..')))
+    except TimeoutException:
+        raise handle_exception(driver, TimeoutException,
+                               'Не удалось установить количество строчек при экспорте', ERROR_FILENAME)
+    if len(row_fields) == 3:
+        conflict_field = row_fields[1]
+        if '(' in conflict_field.text and ')' in conflict_field.text:
+            rows_count = row_limit
+        conflict_field.click()
+    try:
+        download_btn = WebDriverWait(driver, LOAD_TIMEOUT).until(
+            exp_cond.presence_of_element_located(
+                (By.XPATH, '//button[@class="css-15qe8gh-button css-1i73y9f-buttonFocus '
+                           'css-1emi1z8-buttonWidth css-15kjecu-buttonHeight css-q66qvq-buttonCursor"]')))
+    except TimeoutException:
+        raise handle_exception(driver, TimeoutException,
+                               'Не удалось произвести экспорт', ERROR_FILENAME)
+    old_temp_files = set(os.listdir(download_folder))
+    download_btn.click()
+    try:
+        with span('download_wait'):
+            export_filename = wait_for_download(download_folder, old_temp_files,
+                                                lambda path: assert_count_rows(path, rows_count))
+    except DownloadTimeoutException:
+        raise handle_exception(driver, TimeoutException, 'Не удалось дождаться загрузки файла экспорта', ERROR_FILENAME)
+    count('bytes_downloaded', os.path.getsize(export_filename))
+    return export_filename
+
+
+def select_country(driver: Chrome, url: str, country: str):
+    driver.get(url)
+    try:
+        btn = WebDriverWait(driver, LOAD_TIMEOUT).until(
+            exp_cond.presence_of_element_located((
+                By.XPATH, '//div[@class="css-1m3jbw6-dropdown css-mkifqh-dropdownMenuWidth '
+                          'css-1sspey-dropdownWithControl"]'
+                          '/button[@class="css-15qe8gh-button css-ykx4dy-buttonFocus '
+                          'css-1g8qvce-buttonWidth css-15kjecu-buttonHeight '
+                          'css-q66qvq-buttonCursor"]')))
+    except TimeoutException:
+        raise handle_exception(driver, TimeoutException,
+                               'Не удалось нажать кнопку выпадающего меню стран', ERROR_FILENAME)
+    btn.click()
+    try:
+        input_field = WebDriverWait(driver, LOAD_TIMEOUT).until(
+            exp_cond.presence_of_element_located((
+                By.XPATH, '//input[@class="css-19vgjhp-input css-ke2x6i-inputNoBorder css-ocd83c-inputNoPadding '
+                          'css-1e2o21f-inputColor css-lvmapq-inputBorderRadius '
+                          'css-oamlhg-sm css-1o5fyf7-mainFontSize"]'
+            )))
+        input_field.send_keys(country.lower())
+    except TimeoutException:
+        raise handle_exception(driver, TimeoutException,
+                               'Не удалось произвести действия над полем для ввода страны', ERROR_FILENAME)
+    try:
+        country_block = WebDriverWait(driver, LOAD_TIMEOUT).until(
+            exp_cond.presence_of_element_located((
+                By.XPATH, '//div[@class="css-kt22mo-dropdownBaseMenu css-6vm5e4-countrySelectInnerMenu"]'
+                          '/div[@class="css-yufi00-dropdownItem"]'
+            )))
+    except TimeoutException:
+        try:
+            country_block = WebDriverWait(driver, LOAD_TIMEOUT).until(
+                exp_cond.presence_of_element_located((
+                    By.XPATH, '//div[@class="css-kt22mo-dropdownBaseMenu css-6vm5e4-countrySelectInnerMenu"]'
+                              '//div[@class="css-yufi00-dropdownItem css-15h7oaf-dropdownItemSelected"]'
+                )))
+        except TimeoutException:
+            raise handle_exception(driver, TimeoutException,
+                                   f'Не удалось найти в выпадающем меню страну {country}', ERROR_FILENAME)
+    if country_block.text.strip().lower() != country.lower():
+        raise handle_exception(driver, TimeoutException,
+                               f'Не удалось выбрать из выпадающего меню страну {country}', ERROR_FILENAME)
+    country_block.click()
+
+
+def search_chunk(driver: Chrome, chunk_filename: str):
+    # Sending file to the text area
+    try:
+        file_input = WebDriverWait(driver, LOAD_TIMEOUT).until(
+            exp_cond.presence_of_element_located((By.XPATH, EXPLORER_READY_XPATH)))
+    except TimeoutException:
+        raise handle_exception(driver, TimeoutException,
+                               'Не удалось записать запросы в поле для ввода', ERROR_FILENAME)
+    file_input.send_keys(os.path.abspath(chunk_filename))
+    # Search button clicking
+    try:
+        search_btn = WebDriverWait(driver, LOAD_TIMEOUT).until(
+            exp_cond.presence_of_element_located((
+                By.XPATH, '//button[@class="css-15qe8gh-button css-1i73y9f-buttonFocus '
+                          'css-1tdldg1-buttonWidth css-15kjecu-buttonHeight css-q66qvq-buttonCursor"]')))
+    except TimeoutException:
+        raise handle_exception(driver, TimeoutException,
+                               'Не удалось найти кнопку поиска', ERROR_FILENAME)
+    search_btn.click()
+
+
+def get_data(driver: Chrome, url: str, country: str, row_limit: int, chunk_filenames: list,
+             download_folder: str = 'temp', selected: bool = False):
+    # Yields the rows of every chunk; the country is selected once and kept for all the chunks.
+    # selected means it's still selected on the page from the previous call
+    if not selected:
+        with span('select_country'):
+            select_country(driver, url, country)
+    for i, chunk_filename in enumerate(chunk_filenames):
+        if (i or selected) and not driver.find_elements(By.XPATH, EXPLORER_READY_XPATH):
+            # The results page didn't keep the upload form, so the country has to be selected again
+            count('retries')
+            with span('select_country'):
+                select_country(driver, url, country)
+        with span('search'):
+            search_chunk(driver, chunk_filename)
+        with span('export'):
+            export_filename = export(driver, row_limit, download_folder)
+        with span('parse_export'):
+            rows = read_export(export_filename, country)
+        count('rows_parsed', len(rows))
+        yield rows
+
+
+def auth(driver: Chrome, login: str, password: str):
+    login_url = os.getenv('login_url')
+    if not login_url:
+        raise MissingDotenvData('В переменных среды отсутствует login_url')
+    driver.get(login_url)
+    for input_name, verbose_name, value in [('email', 'логина', login), ('password', 'пароля', password)]:
+        try:
+            field = driver.find_element(By.XPATH, f'//input[@name="{input_name}"]')
+        except NoSuchElementException:
+            raise AuthorizationFailedException(f'Не удалось найти поле для ввода {verbose_name}')
+        for s in value:
+            field.send_keys(s)
+            time.sleep(float(f'0.1{randint(0, 9)}'))
+    try:
+        driver.find_element(By.XPATH, '//button[@type="submit"]').click()
+    except (NoSuchElementException, ElementClickInterceptedException, ElementNotInteractableException) as e:
+        raise AuthorizationFailedException(f'Не удалось нажать на кнопку авторизации [{e.__class__.__name__}]')
+
+
+def read_credentials():
+    with open(os.getenv('credentials_filename'), encoding='utf-8') as f:
+        lines = [x.strip() for x in f.readlines()]
+    if len(lines) > 1:
+        login_url, base_url = lines
+    else:
+        login_url, base_url = os.getenv('login_url'), os.getenv('base_url')
+        if not login_url:
+            raise MissingDotenvData('В переменных среды отсутствует login_url')
+    try:
+        login, password = lines[0].split(':')
+    except ValueError:
+        raise InvalidFileData(f'Неверный формат данных в {os.getenv("credentials_filename")}')
+    return login_url, base_url, login, password, len(lines) > 1
+
+
+def explorer_url(base_url: str):
+    return f'{base_url.rstrip("/")}/keywords-explorer'
+
+
+def save_cookies(driver: Chrome, filename: str):
+    with open(f'{filename}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(driver.get_cookies(), f)
+    os.replace(f'{filename}.tmp', filename)
+
+
+def load_cookies(driver: Chrome, base_url: str, filename: str):
+    # Chrome keeps persistent cookies in the profile itself, the jar also brings back the session ones
+    try:
+        with open(filename, encoding='utf-8') as f:
+            cookies = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return
+    driver.get(base_url)
+    for cookie in cookies:
+        if cookie.get('expiry') is not None and cookie['expiry'] < time.time():
+            continue
+        try:
+            driver.add_cookie(cookie)
+        except WebDriverException:
+            pass
+
+
+def session_is_valid(driver: Chrome, url: str, login_url: str):
+    # Either the explorer's upload form shows up or the site redirects to the login page
+    driver.get(url)
+    try:
+        WebDriverWait(driver, LOAD_TIMEOUT).until(
+            lambda d: d.current_url.startswith(login_url) or d.find_elements(By.XPATH, EXPLORER_READY_XPATH))
+    except TimeoutException:
+        return False
+    return not driver.current_url.startswith(login_url)
+
+
+def wait_for_login(driver: Chrome, login_url: str, timeout: float):
+    try:
+        WebDriverWait(driver, timeout, LOGIN_POLL_INTERVAL).until(exp_cond.url_changes(login_url))
+    except TimeoutException:
+        return False
+    return True
+
+
+def authorize(driver: Chrome, cookies_filename: str = None):
+    login_url, base_url, login, password, third_party_source = read_credentials()
+    if cookies_filename is not None:
+        load_cookies(driver, base_url, cookies_filename)
+        if session_is_valid(driver, explorer_url(base_url), login_url):
+            print('Сессия восстановлена...')
+            save_cookies(driver, cookies_filename)
+            return base_url
+    if not third_party_source:
+        auth(driver, login, password)
+        if not wait_for_login(driver, login_url, AUTH_TIMEOUT):
+            auth(driver, login, password)
+            wait_for_login(driver, login_url, AUTH_TIMEOUT)
+    else:
+        driver.get(login_url)
+        print('Ожидание авторизации пользователем...')
+        while not wait_for_login(driver, login_url, LOAD_TIMEOUT):
+            pass
+    print('Авторизация прошла успешно...')
+    if cookies_filename is not None:
+        save_cookies(driver, cookies_filename)
+    return base_url
+
+
+def open_session(number: int, temp_folder: str = 'temp', sessions_count: int = 1, name: str = None):
+    # Every browser gets its own download folder so that parallel exports can't be mixed up, and its own
+    # profile because Chrome locks a user-data-dir for the lifetime of the browser. A name replaces
+    # session_<number> in both folders, for browsers started by different processes
+    download_folder = temp_folder if sessions_count == 1 and name is None else \
+        os.path.join(temp_folder, name or f'session_{number + 1}')
+    os.makedirs(download_folder, exist_ok=True)
+    profile_folder, cookies_filename = os.getenv('profile_folder', 'profile'), None
+    if profile_folder:
+        profile_folder = os.path.abspath(os.path.join(profile_folder, name or f'session_{number + 1}'))
+        os.makedirs(profile_folder, exist_ok=True)
+        cookies_filename = os.path.join(profile_folder, 'cookies.json')
+    with span('driver_start'):
+        driver = get_driver(os.path.abspath(download_folder), profile_folder or None)
+    if download_folder != temp_folder:
+        base, ext = os.path.splitext(ERROR_FILENAME)
+        driver.error_filename = f'{base}_{os.path.basename(download_folder)}{ext}'
+    try:
+        with span('auth'):
+            base_url = authorize(driver, cookies_filename)
+    except Exception:
+        driver.quit()
+        raise
+    return ScrapeSession(driver, explorer_url(base_url), download_folder)
+
+
+def open_api_client(temp_folder: str = 'temp'):
+    # The browser is only needed to log in: the data is then fetched over HTTP with the session cookies
+    from api import ApiClient, extract_cookies
+    api_url = os.getenv('api_url')
+    if not api_url:
+        raise MissingDotenvData('В переменных среды отсутствует api_url')
+    session = open_session(0, temp_folder)
+    try:
+        cookies = extract_cookies(session.driver)
+    finally:
+        session.close()
+    return ApiClient(api_url, cookies)
@@ -0,0 +1,88 @@
+import os
+import time
+from csv import DictReader
+from hashlib import sha256
+
+from instrumentation import count
+from store import MetricsTable
+from constants import EXPORT_KEYS, CACHE_TTL, CACHE_MAX_SIZE
+from writers import CsvStreamWriter
+
+
+def chunk_hash(phrases: list):
+    return sha256('\n'.join(phrases).encode('utf-8')).hexdigest()
+
+
+def read_rows(filename: str):
+    table = MetricsTable()
+    with open(filename, encoding='utf-8') as f:
+        for d in DictReader(f, delimiter=';'):
+            table.append(d['Keyword'], d['Country'], int(d['Difficulty']) if d['Difficulty'] else None,
+                         int(d['Volume']) if d['Volume'] else None)
+    return table
+
+
+def write_rows(filename: str, rows: list):
+    with CsvStreamWriter(filename, EXPORT_KEYS, atomic=True) as writer:
+        writer.writerows(rows)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ExportCache:
+    # Parsed export rows stored as <folder>/<sha256(country + phrases chunk)>.csv
+    def __init__(self, folder: str = None, ttl: float = None, max_size: int = None):
+        self.folder = folder or os.getenv('cache_folder', 'cache')
+        self.ttl = ttl if ttl is not None else float(os.getenv('cache_ttl', CACHE_TTL))
+        self.max_size = max_size if max_size is not None else int(os.getenv('cache_max_size', CACHE_MAX_SIZE))
+        os.makedirs(self.folder, exist_ok=True)
+
+    def key(self, country: str, phrases: list):
+        return sha256(f'{country.lower()}\n{chunk_hash(phrases)}'.encode('utf-8')).hexdigest()
+
+    def path(self, country: str, phrases: list):
+        return os.path.join(self.folder, f'{self.key(country, phrases)}.csv')
+
+    def get(self, country: str, phrases: list):
+        path = self.path(country, phrases)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                _remove(path)
+                count('cache_stale')
+                return None
+            rows = read_rows(path)
+        except FileNotFoundError:
+            count('cache_misses')
+            return None
+        count('cache_hits')
+        return rows
+
+    def put(self, country: str, phrases: list, rows: list):
+        write_rows(self.path(country, phrases), rows)
+        self.evict()
+
+    def evict(self):
+        now, entries = time.time(), []
+        for filename in os.listdir(self.folder):
+            if not filename.endswith('.csv'):
+                continue
+            path = os.path.join(self.folder, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.ttl:
+                _remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            _remove(path)
+            total_size -= size
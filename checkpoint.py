@@ -0,0 +1,57 @@
+import json
+import os
+from shutil import rmtree
+from threading import Lock
+
+from cache import chunk_hash, read_rows, write_rows
+
+
+class CheckpointJournal:
+    # Append-only log of finished (country, chunk) exports; the rows themselves are kept next to it
+    def __init__(self, folder: str = None, resume: bool = False):
+        self.folder = folder or os.getenv('checkpoint_folder', 'checkpoint')
+        self.journal_filename = os.path.join(self.folder, 'journal.jsonl')
+        if not resume and os.path.exists(self.folder):
+            rmtree(self.folder)
+        os.makedirs(self.folder, exist_ok=True)
+        self.completed = self.load()
+        self.lock = Lock()
+
+    def load(self):
+        completed = dict()
+        if not os.path.exists(self.journal_filename):
+            return completed
+        with open(self.journal_filename, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line may be cut off if the run crashed while writing it
+                    continue
+                completed[entry['country'], entry['chunk']] = entry
+        return completed
+
+    def get(self, country: str, phrases: list):
+        entry = self.completed.get((country, chunk_hash(phrases)))
+        if entry is None:
+            return None
+        try:
+            rows = read_rows(os.path.join(self.folder, entry['filename']))
+        except FileNotFoundError:
+            return None
+        return rows if len(rows) == entry['rows'] else None
+
+    def record(self, country: str, phrases: list, rows: list):
+        chunk = chunk_hash(phrases)
+        entry = {'country': country, 'chunk': chunk, 'rows': len(rows),
+                 'filename': f'{chunk_hash([country, chunk])}.csv'}
+        write_rows(os.path.join(self.folder, entry['filename']), rows)
+        with self.lock:
+            with open(self.journal_filename, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.completed[country, chunk] = entry
+
+    def __len__(self):
+        return len(self.completed)
@@ -2,6 +2,22 @@ AUTH_TIMEOUT = 3
 LOAD_TIMEOUT = 5
 ROWS_LOAD_TIMEOUT = 30
 COOKIES_TIMEOUT = 20
+LOGIN_POLL_INTERVAL = 0.2
+DOWNLOAD_TIMEOUT = 120
+DOWNLOAD_POLL_INTERVAL = 0.1
+DOWNLOAD_MAX_POLL_INTERVAL = 2
+CACHE_TTL = 3 * 24 * 60 * 60
+CACHE_MAX_SIZE = 1 << 30
+PARALLEL_MIN_FILES = 4
+WATCH_INTERVAL = 1
+API_TIMEOUT = 30
+API_RETRIES = 3
+API_BACKOFF = 1
+API_MAX_BACKOFF = 30
+API_RETRY_STATUSES = (429, 500, 502, 503, 504)
+JOB_LEASE = 15 * 60
+JOB_MAX_ATTEMPTS = 3
+QUEUE_POLL_INTERVAL = 5
 HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
                          'AppleWebKit/537.36 (KHTML, like Gecko) '
                          'Chrome/95.0.4638.69 Safari/537.36',
@@ -10,6 +26,7 @@ COUNTRIES_FIELDNAMES = ['Страна', 'Коэффициент']
 PHRASES_FIELDNAMES = ['Запрос', 'Название']
 EXPORT_KEYS = ['Keyword', 'Country', 'Difficulty', 'Volume']
 ERROR_FILENAME = 'error.jpg'
+EXPLORER_READY_XPATH = '//input[@class="css-1ew8z33-input"]'
 COUNTRIES_CODES = {
     "af": "Afghanistan",
     "al": "Albania",
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import time
+from threading import Lock
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS metrics (
+    keyword TEXT NOT NULL,
+    keyword_lower TEXT NOT NULL,
+    country TEXT NOT NULL,
+    difficulty INTEGER,
+    volume INTEGER,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (keyword, country)
+);
+CREATE INDEX IF NOT EXISTS metrics_keyword_lower ON metrics (keyword_lower, country);
+CREATE INDEX IF NOT EXISTS metrics_country_volume ON metrics (country, volume);
+CREATE TABLE IF NOT EXISTS project_metrics (
+    project TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    country TEXT NOT NULL,
+    PRIMARY KEY (project, keyword, country)
+);
+'''
+
+UPSERT_QUERY = '''
+INSERT INTO metrics (keyword, keyword_lower, country, difficulty, volume, fetched_at) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (keyword, country) DO UPDATE SET
+    difficulty = excluded.difficulty, volume = excluded.volume, fetched_at = excluded.fetched_at
+'''
+
+
+class MetricsDatabase:
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+        self.lock = Lock()
+
+    def upsert(self, rows, project: str = None, fetched_at: float = None):
+        # With a project the rows are also recorded as the project's, in the order they come in
+        fetched_at = fetched_at or time.time()
+        with self.lock, self.connection:
+            rows = [(row['Keyword'], row['Country'], row['Difficulty'], row['Volume']) for row in rows]
+            self.connection.executemany(UPSERT_QUERY, ((keyword, keyword.lower(), country, difficulty, volume,
+                                                        fetched_at) for keyword, country, difficulty, volume in rows))
+            if project is not None:
+                self.connection.executemany(
+                    'INSERT OR IGNORE INTO project_metrics (project, keyword, country) VALUES (?, ?, ?)',
+                    ((project, keyword, country) for keyword, country, _, _ in rows))
+
+    def clear_project(self, project: str):
+        # Called before a run stores its rows again, so the project is exactly the rows of its last run
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM project_metrics WHERE project = ?', (project,))
+
+    def project(self, project: str):
+        return ProjectMetrics(self, project)
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM metrics').fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ProjectMetrics:
+    # The stored rows of one project. Other projects' rows share the store but don't change its max volumes
+    def __init__(self, database: MetricsDatabase, project: str):
+        self.database = database
+        self.project = project
+
+    def iter_values(self, keywords: set = None):
+        # Rows come in the order the project stored them, so that the first-seen row wins in KeywordIndex
+        # like with the run's own table
+        database = self.database
+        with database.lock:
+            if keywords is None:
+                return database.connection.execute(
+                    'SELECT m.keyword, m.country, m.difficulty, m.volume FROM project_metrics p '
+                    'JOIN metrics m ON m.keyword = p.keyword AND m.country = p.country '
+                    'WHERE p.project = ? ORDER BY p.rowid', (self.project,)).fetchall()
+            database.connection.execute('CREATE TEMP TABLE IF NOT EXISTS wanted (keyword_lower TEXT PRIMARY KEY)')
+            with database.connection:
+                database.connection.execute('DELETE FROM wanted')
+                database.connection.executemany('INSERT OR IGNORE INTO wanted VALUES (?)',
+                                                ((keyword,) for keyword in keywords))
+            return database.connection.execute(
+                'SELECT m.keyword, m.country, m.difficulty, m.volume FROM project_metrics p '
+                'JOIN metrics m ON m.keyword = p.keyword AND m.country = p.country '
+                'JOIN wanted w ON w.keyword_lower = m.keyword_lower '
+                'WHERE p.project = ? ORDER BY p.rowid', (self.project,)).fetchall()
+
+    def max_volumes(self):
+        with self.database.lock:
+            return dict(self.database.connection.execute(
+                'SELECT m.country, MAX(m.volume) FROM project_metrics p '
+                'JOIN metrics m ON m.keyword = p.keyword AND m.country = p.country '
+                'WHERE p.project = ? AND m.volume IS NOT NULL GROUP BY m.country', (self.project,)).fetchall())
+
+    def __len__(self):
+        with self.database.lock:
+            return self.database.connection.execute(
+                'SELECT COUNT(*) FROM project_metrics WHERE project = ?', (self.project,)).fetchone()[0]
+
+
+def open_database(filename: str = None):
+    filename = filename or os.getenv('database_filename')
+    return MetricsDatabase(filename) if filename else None
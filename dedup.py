@@ -0,0 +1,47 @@
+from store import MetricsTable
+
+DEDUP_POLICIES = ('first', 'max_volume', 'latest')
+
+
+def _volume(volume):
+    return volume if volume is not None else -1
+
+
+class Deduplicator:
+    def __init__(self, policy: str = 'first'):
+        if policy not in DEDUP_POLICIES:
+            raise ValueError(f'Неизвестная политика дедупликации: {policy} (доступны: {", ".join(DEDUP_POLICIES)})')
+        self.policy = policy
+        self.table = MetricsTable()
+        # (keyword id << 16 | country id) -> position of the row in the table
+        self.positions = dict()
+
+    def add(self, row: dict):
+        return self.add_values(row['Keyword'], row['Country'], row['Difficulty'], row['Volume'])
+
+    def add_values(self, keyword: str, country: str, difficulty, volume):
+        table = self.table
+        keyword_id, country_id = table.intern_keyword(keyword), table.intern_country(country)
+        key = keyword_id << 16 | country_id
+        position = self.positions.get(key)
+        if position is None:
+            self.positions[key] = len(table)
+            table.append_ids(keyword_id, country_id, difficulty, volume)
+            return True
+        if self.policy == 'latest' or (self.policy == 'max_volume' and
+                                       _volume(volume) > _volume(table.get_volume(position))):
+            table.set_values(position, difficulty, volume)
+        return False
+
+    def extend(self, rows):
+        if isinstance(rows, MetricsTable):
+            for values in rows.iter_values():
+                self.add_values(*values)
+        else:
+            for row in rows:
+                self.add(row)
+        return self
+
+    def __len__(self):
+        return len(self.table)
+
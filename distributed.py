@@ -0,0 +1,147 @@
+import os
+import re
+import socket
+import time
+from argparse import ArgumentParser
+from dotenv import load_dotenv
+
+from browser import get_data, open_session
+from constants import EXPORT_KEYS, QUEUE_POLL_INTERVAL
+from database import open_database
+from dedup import Deduplicator
+from exceptions import JobsFailedException
+from instrumentation import instrumentation
+from jobqueue import JobQueue, open_queue
+from planner import plan_chunks
+from scoring import process_data
+from store import MetricsTable
+from utils import retrieve_countries, retrieve_phrases, write_phrases_text
+from writers import CsvStreamWriter
+
+
+def coordinate(queue: JobQueue, project: str, countries: list, row_limit: int, phrases_text_filename: str,
+               output_filename: str, resume: bool = False, interval: float = QUEUE_POLL_INTERVAL):
+    chunks = plan_chunks(phrases_text_filename, row_limit)
+    queue.submit(project, countries, chunks, row_limit, clear=not resume)
+    total_count, last_progress = len(countries) * len(chunks), None
+    while True:
+        progress = queue.progress(project)
+        if progress != last_progress:
+            print(f'[{progress["done"]}/{total_count}] в работе: {progress["leased"]}, '
+                  f'в очереди: {progress["pending"]}, с ошибкой: {progress["failed"]}')
+            last_progress = progress
+        if progress['done'] + progress['failed'] >= total_count:
+            break
+        time.sleep(interval)
+    if progress['failed']:
+        raise JobsFailedException('Не удалось выгрузить: ' + '; '.join(
+            f'{country} (часть {chunk + 1}): {error}' for country, chunk, error in queue.errors(project)))
+    database, merged = open_database(), []
+    if database is not None:
+        database.clear_project(output_filename)
+    with CsvStreamWriter(output_filename, EXPORT_KEYS) as writer:
+        for country in countries:
+            data = Deduplicator(os.getenv('dedup_policy', 'first')).extend(queue.results(project, country)).table
+            if database is not None:
+                database.upsert(data, output_filename)
+            writer.writerows(data)
+            merged.append(data)
+    return MetricsTable.concat(merged), database
+
+
+def work(queue: JobQueue, project: str, temp_folder: str = 'temp', batch: int = None,
+         interval: float = QUEUE_POLL_INTERVAL, name: str = None):
+    # Leases jobs until none are left. A job whose worker dies is handed out again when its lease expires.
+    # The worker name is also its folder name under temp_folder and profile_folder, so workers sharing a disk
+    # don't download into the same folder or lock the same browser profile
+    worker = re.sub(r'[^\w.-]', '_', name or f'{socket.gethostname()}_{os.getpid()}')
+    batch = batch or int(os.getenv('job_batch', 5))
+    jobs_folder = os.path.join(temp_folder, worker, 'jobs')
+    os.makedirs(jobs_folder, exist_ok=True)
+    session, done_count, waiting = None, 0, False
+    try:
+        while True:
+            jobs = queue.lease(project, worker, batch)
+            if not jobs:
+                # A worker may start before the coordinator has submitted the project: it waits for the jobs
+                # and only leaves once there are some and every one of them is done or failed
+                progress = queue.progress(project)
+                if not any(progress.values()) and not waiting:
+                    print(f'Ожидание заданий проекта {project}...')
+                    waiting = True
+                elif any(progress.values()) and not progress['pending'] and not progress['leased']:
+                    break
+                time.sleep(interval)
+                continue
+            if session is None:
+                session = open_session(0, temp_folder, name=worker)
+            filenames, remaining = [], [job['id'] for job in jobs]
+            for job in jobs:
+                filenames.append(os.path.join(jobs_folder, f'{job["id"]}.txt'))
+                with open(filenames[-1], 'w', encoding='utf-8') as f:
+                    f.write('\n'.join(job['phrases']))
+            country = jobs[0]['country']
+            try:
+                for job, data in zip(jobs, get_data(session.driver, session.url, country, jobs[0]['row_limit'],
+                                                    filenames, session.download_folder)):
+                    if queue.complete(job['id'], worker, data):
+                        done_count += 1
+                        print(f'{country} (часть {job["chunk"] + 1}): {len(data)} rows')
+                    else:
+                        print(f'{country} (часть {job["chunk"] + 1}): аренда истекла, результат отброшен')
+                    remaining.remove(job['id'])
+                    queue.renew(remaining, worker)
+            except Exception as e:
+                for job_id in remaining:
+                    queue.fail(job_id, worker, f'{e.__class__.__name__}: {e}')
+                print(f'{country}: {e.__class__.__name__}: {e}')
+                # The page may be left in any state, the next jobs start with a fresh browser
+                session.close()
+                session = None
+    finally:
+        if session is not None:
+            session.close()
+    print(f'Выполнено заданий: {done_count}')
+    return done_count
+
+
+def main(role: str, project: str = None, resume: bool = False, row_limit: int = 5000, vol_k: float = None,
+         dif_k: float = None, batch: int = None, name: str = None):
+    project = project or os.getenv('output_filename', 'output.csv')
+    temp_folder = os.getenv('temp_folder', 'temp')
+    with open_queue() as queue:
+        if role == 'worker':
+            return work(queue, project, temp_folder, batch, name=name)
+        countries = {c['Страна']: float(c['Коэффициент']) for c in retrieve_countries(os.getenv('countries_filename'))}
+        phrases = retrieve_phrases(os.getenv('phrases_filename'))
+        if vol_k is None or dif_k is None:
+            vol_k, dif_k = map(float, input('Введите коэффициенты Volume и Difficulty через пробел '
+                                            '(если число вещественное, то дробную часть записывать через "."):\n')
+                               .split())
+        phrases_text_filename = write_phrases_text(phrases, os.getenv('phrases_filename'))
+        output_filename = os.getenv('output_filename', 'output.csv')
+        data, database = coordinate(queue, project, list(countries.keys()), row_limit, phrases_text_filename,
+                                    output_filename, resume)
+    process_data(data if database is None else database.project(output_filename), output_filename, countries,
+                 phrases, vol_k, dif_k)
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    parser = ArgumentParser(description='Выгрузка одного проекта несколькими машинами через общую очередь '
+                                        '(queue_filename, например на общем сетевом диске)')
+    parser.add_argument('role', choices=['coordinator', 'worker'],
+                        help='coordinator ставит задания и собирает результаты, worker выполняет задания')
+    parser.add_argument('--project', help='имя проекта в очереди (по умолчанию output_filename)')
+    parser.add_argument('--resume', action='store_true', help='не сбрасывать уже выполненные задания проекта')
+    parser.add_argument('--row-limit', type=int, default=5000, help='лимит строк в одной выгрузке')
+    parser.add_argument('--vol-k', type=float, help='коэффициент Volume')
+    parser.add_argument('--dif-k', type=float, help='коэффициент Difficulty')
+    parser.add_argument('--batch', type=int, help='сколько заданий одной страны брать за раз')
+    parser.add_argument('--name', help='имя worker, уникальное среди запущенных; по нему названы его папки '
+                                       'выгрузок и профиля браузера (по умолчанию хост и PID процесса)')
+    parser.add_argument('--report', help='сохранить в JSON время этапов и счётчики')
+    parser.add_argument('--profile', help='сохранить профиль cProfile')
+    args = parser.parse_args()
+    instrumentation.setup(args.report, args.profile)
+    main(args.role, args.project, args.resume, args.row_limit, args.vol_k, args.dif_k, args.batch, args.name)
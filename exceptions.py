@@ -23,4 +23,12 @@ class FileIsEmptyException(Exception):
 
 
 class ApiException(Exception):
+    pass
+
+
+class DownloadTimeoutException(Exception):
+    pass
+
+
+class JobsFailedException(Exception):
     pass
\ No newline at end of file
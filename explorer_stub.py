@@ -0,0 +1,222 @@
+import json
+import os
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from tempfile import TemporaryDirectory
+from threading import Thread
+
+from cache import ExportCache
+from constants import COUNTRIES_CODES
+from general import parse
+
+LOGIN_PAGE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Вход (заглушка)</title></head>
+<body>
+<form id="login">
+<input name="email"><input name="password" type="password"><button type="submit">Войти</button>
+</form>
+<script>
+document.getElementById('login').onsubmit = event => {
+    event.preventDefault();
+    document.cookie = 'session=stub; path=/';
+    location.assign('/keywords-explorer');
+};
+</script>
+</body></html>
+'''
+
+# The elements and classes are the ones browser.py looks for on the real keywords explorer
+EXPLORER_PAGE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Keywords Explorer (заглушка)</title></head>
+<body>
+<div id="app"></div>
+<script>
+const COUNTRIES = %(countries)s;
+const KEEP_FORM = %(keep_form)s;
+const app = document.getElementById('app');
+let country = null, keywords = [];
+
+function element(html) {
+    const template = document.createElement('template');
+    template.innerHTML = html.trim();
+    return template.content.firstChild;
+}
+
+function quote(value) {
+    return /[",\\n]/.test(value) ? '"' + value.replace(/"/g, '""') + '"' : value;
+}
+
+function countryDropdown() {
+    const dropdown = element('<div class="css-1m3jbw6-dropdown css-mkifqh-dropdownMenuWidth ' +
+        'css-1sspey-dropdownWithControl"><button class="css-15qe8gh-button css-ykx4dy-buttonFocus ' +
+        'css-1g8qvce-buttonWidth css-15kjecu-buttonHeight css-q66qvq-buttonCursor">Страна</button></div>');
+    dropdown.firstChild.onclick = () => {
+        const input = element('<input class="css-19vgjhp-input css-ke2x6i-inputNoBorder css-ocd83c-inputNoPadding ' +
+            'css-1e2o21f-inputColor css-lvmapq-inputBorderRadius css-oamlhg-sm css-1o5fyf7-mainFontSize">');
+        const menu = element('<div class="css-kt22mo-dropdownBaseMenu css-6vm5e4-countrySelectInnerMenu"></div>');
+        input.oninput = () => {
+            menu.innerHTML = '';
+            const code = Object.keys(COUNTRIES).find(
+                code => COUNTRIES[code].toLowerCase().startsWith(input.value.toLowerCase()));
+            if (!input.value || code === undefined) return;
+            const item = element('<div class="css-yufi00-dropdownItem"></div>');
+            item.textContent = COUNTRIES[code];
+            item.onclick = () => {
+                country = code;
+                dropdown.firstChild.textContent = COUNTRIES[code];
+                input.remove();
+                menu.remove();
+            };
+            menu.append(item);
+        };
+        dropdown.append(input, menu);
+    };
+    return dropdown;
+}
+
+function uploadForm(results) {
+    const form = element('<div><input type="file" class="css-1ew8z33-input"><button class="css-15qe8gh-button ' +
+        'css-1i73y9f-buttonFocus css-1tdldg1-buttonWidth css-15kjecu-buttonHeight ' +
+        'css-q66qvq-buttonCursor">Найти</button></div>');
+    const [upload, search] = form.children;
+    search.onclick = () => {
+        // The old results go away at once, so that their row count can't be read for the new search
+        results.innerHTML = '';
+        const file = upload.files[0];
+        if (country === null || file === undefined) {
+            results.textContent = 'Выберите страну и файл';
+            return;
+        }
+        file.text().then(text => {
+            keywords = text.split('\\n').map(keyword => keyword.trim()).filter(keyword => keyword);
+            upload.value = '';
+            if (!KEEP_FORM) form.remove();
+            const rowsCount = element('<span class="css-a5m6co-text css-p8ym46-fontFamily css-1wmho6b-fontWeight ' +
+                'css-18j1nfb-display"></span>');
+            rowsCount.textContent = keywords.length.toLocaleString('en-US') + ' keywords';
+            results.append(rowsCount, exportButton(results));
+        });
+    };
+    return form;
+}
+
+function exportButton(results) {
+    const button = element('<button class="css-15qe8gh-button css-ykx4dy-buttonFocus css-1emi1z8-buttonWidth ' +
+        'css-15kjecu-buttonHeight css-q66qvq-buttonCursor">Export</button>');
+    button.onclick = () => {
+        const dialog = element('<div>' +
+            '<label><input type="radio" name="export-encoding-options">UTF-16</label>' +
+            '<label><input type="radio" name="export-encoding-options">UTF-8</label>' +
+            '<label><input type="radio" name="export-number-of-rows" checked>Все строки</label>' +
+            '<label><input type="radio" name="export-number-of-rows">Первые строки</label>' +
+            '<button class="css-15qe8gh-button css-1i73y9f-buttonFocus css-1emi1z8-buttonWidth ' +
+            'css-15kjecu-buttonHeight css-q66qvq-buttonCursor">Скачать</button></div>');
+        dialog.lastChild.onclick = () => {
+            const lines = keywords.map((keyword, i) => [i + 1, quote(keyword), country, keyword.length %% 100,
+                keyword.length * 10, '0.10', '1.1', quote(keyword), '2021-11-01'].join(','));
+            const data = ['#,Keyword,Country,Difficulty,Volume,CPC,CPS,Parent Keyword,Last Update', ...lines];
+            const link = document.createElement('a');
+            link.href = URL.createObjectURL(new Blob([data.join('\\n') + '\\n'], {type: 'text/csv'}));
+            link.download = country + '-export-' + Date.now() + '.csv';
+            link.click();
+            dialog.remove();
+        };
+        results.append(dialog);
+    };
+    return button;
+}
+
+if (!document.cookie.split('; ').includes('session=stub')) {
+    location.replace('/login');
+} else {
+    const results = element('<div></div>');
+    app.append(countryDropdown(), uploadForm(results), results);
+}
+</script>
+</body></html>
+'''
+
+
+def expected_metrics(keyword: str):
+    # Difficulty and Volume that the stub exports for a keyword
+    return len(keyword) % 100, len(keyword) * 10
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Login page and a static keywords explorer: the search takes the uploaded phrases file and the export
+    # downloads a CSV with one row per phrase. keep_form=False drops the upload form from the results page
+    keep_form = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status: int, body: str = ''):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.split('?')[0].rstrip('/')
+        if path == '/login':
+            self.send(200, LOGIN_PAGE)
+        elif path == '/keywords-explorer':
+            self.send(200, EXPLORER_PAGE % {'countries': json.dumps(COUNTRIES_CODES, ensure_ascii=False),
+                                            'keep_form': json.dumps(self.keep_form)})
+        elif path == '':
+            self.send(200, '<!DOCTYPE html><html><body><a href="/keywords-explorer">Keywords Explorer</a></body></html>')
+        else:
+            self.send(404)
+
+
+def serve(port: int = 0, keep_form: bool = True):
+    handler = type('Handler', (StubHandler,), {'keep_form': keep_form})
+    return ThreadingHTTPServer(('127.0.0.1', port), handler)
+
+
+def check(sessions_count: int = 2, keep_form: bool = True):
+    # parse() against the stub with several browsers: every (country, chunk) is exported once and merged
+    server = serve(keep_form=keep_form)
+    Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    countries, row_limit = ['United States', 'Germany', 'France'], 4
+    phrases = [f'stub keyword {i}' for i in range(1, 4 * row_limit)]
+    try:
+        with TemporaryDirectory() as folder:
+            credentials_filename = os.path.join(folder, 'credentials.txt')
+            with open(credentials_filename, 'w', encoding='utf-8') as f:
+                f.write('user@example.com:password')
+            phrases_text_filename = os.path.join(folder, 'phrases.txt')
+            with open(phrases_text_filename, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(phrases))
+            os.environ.update({'login_url': f'{base_url}/login', 'base_url': base_url,
+                               'credentials_filename': credentials_filename,
+                               'profile_folder': os.path.join(folder, 'profile'), 'min_delay': '0', 'max_delay': '0'})
+            data, _ = parse(countries, row_limit, os.path.join(folder, 'temp'), phrases_text_filename,
+                            sessions_count, ExportCache(os.path.join(folder, 'cache')),
+                            output_filename=os.path.join(folder, 'output.csv'),
+                            checkpoint_folder=os.path.join(folder, 'checkpoint'))
+            rows = {(row['Keyword'], row['Country']): (row['Difficulty'], row['Volume']) for row in data}
+            expected = {(phrase, country): expected_metrics(phrase) for phrase in phrases for country in countries}
+            assert len(data) == len(expected) and rows == expected, f'Неверные строки: {len(data)} из {len(expected)}'
+    finally:
+        server.shutdown()
+    print(f'OK: {len(data)} rows, sessions={sessions_count}, форма поиска {"остаётся" if keep_form else "пропадает"}')
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Локальная заглушка страницы Keywords Explorer и проверка parse() на ней')
+    parser.add_argument('--serve', type=int, metavar='PORT',
+                        help='только запустить заглушку на порту (login_url=http://127.0.0.1:PORT/login, '
+                             'base_url=http://127.0.0.1:PORT)')
+    parser.add_argument('--sessions', type=int, default=2, help='количество параллельных браузеров в проверке')
+    parser.add_argument('--drop-form', action='store_true',
+                        help='убирать форму загрузки со страницы результатов, как при повторном выборе страны')
+    args = parser.parse_args()
+    if args.serve is None:
+        check(args.sessions, not args.drop_form)
+    else:
+        print(f'Заглушка Keywords Explorer: http://127.0.0.1:{args.serve}/keywords-explorer')
+        serve(args.serve, not args.drop_form).serve_forever()
@@ -1,151 +1,101 @@
 import os
-import time
-from csv import DictWriter
-from random import randint
-
-from selenium.common.exceptions import (NoSuchElementException, ElementClickInterceptedException,
-                                        ElementNotInteractableException)
-from selenium.webdriver import Chrome  # for annotation
-from selenium.webdriver.common.by import By
-
 
 from constants import *
-from exceptions import *
-from utils import get_driver, get_data, calculate_vol, calculate_dif
+from browser import get_data, open_session
+from cache import ExportCache
+from checkpoint import CheckpointJournal
+from database import MetricsDatabase
+from dedup import Deduplicator
+from planner import plan_chunks
+from scheduler import ScrapeScheduler, ScrapeSession
+from store import MetricsTable
+from writers import CsvStreamWriter
 
 
-def auth(driver: Chrome, login: str, password: str):
-    login_url = os.getenv('login_url')
-    if not login_url:
-        raise MissingDotenvData('В переменных среды отсутствует login_url')
-    driver.get(login_url)
-    for input_name, verbose_name, value in [('email', 'логина', login), ('password', 'пароля', password)]:
-        try:
-            field = driver.find_element(By.XPATH, f'//input[@name="{input_name}"]')
-        except NoSuchElementException:
-            raise AuthorizationFailedException(f'Не удалось найти поле для ввода {verbose_name}')
-        for s in value:
-            field.send_keys(s)
-            time.sleep(float(f'0.1{randint(0, 9)}'))
-    try:
-        driver.find_element(By.XPATH, '//button[@type="submit"]').click()
-    except (NoSuchElementException, ElementClickInterceptedException, ElementNotInteractableException) as e:
-        raise AuthorizationFailedException(f'Не удалось нажать на кнопку авторизации [{e.__class__.__name__}]')
+def parse(countries: list, row_limit: int, temp_folder: str = 'temp',
+          phrases_text_filename: str = 'phrases.txt', sessions_count: int = None, cache: ExportCache = None,
+          resume: bool = False, database: MetricsDatabase = None, output_filename: str = None,
+          scheduler: ScrapeScheduler = None, checkpoint_folder: str = None, api_client=None):
+    if api_client is not None:
+        from api import ApiSession
+        sessions_count = api_client.workers
 
+        def session_factory(number: int):
+            return ApiSession(api_client)
+    else:
+        sessions_count = sessions_count or int(os.getenv('sessions', 1))
 
-def parse(countries: list, row_limit: int, temp_folder: str = 'temp',
-          phrases_text_filename: str = 'phrases.txt'):
-    third_party_source = False
-    driver = get_driver(os.path.abspath(temp_folder))
-    with open(os.getenv('credentials_filename'), encoding='utf-8') as f:
-        lines = [x.strip() for x in f.readlines()]
-        if len(lines) > 1:
-            third_party_source = True
-            login_url, base_url = lines
+        def session_factory(number: int):
+            return open_session(number, temp_folder, sessions_count)
+    cache = cache or ExportCache()
+    journal = CheckpointJournal(checkpoint_folder, resume)
+    output_filename = output_filename or os.getenv('output_filename', 'output.csv')
+    dedup_policy = os.getenv('dedup_policy', 'first')
+    chunks = plan_chunks(phrases_text_filename, row_limit)
+    # The output file names the project in the database: its rows are stored again by this run
+    if database is not None:
+        database.clear_project(output_filename)
+    # One job per (country, chunk) missing from the checkpoint and the cache, so that the sessions can share
+    # the chunks of a country. The chunk files are written once by plan_chunks and only read by the sessions
+    results, merged, jobs, remaining = dict(), dict(), [], dict()
+    for country in countries:
+        remaining[country] = 0
+        for i, chunk in enumerate(chunks):
+            data = journal.get(country, chunk.phrases)
+            if data is None:
+                data = cache.get(country, chunk.phrases)
+            if data is None:
+                jobs.append((country, i))
+                remaining[country] += 1
+            else:
+                results[country, i] = data
+    total_count, done_count = len(countries), 0
+
+    def handle(session: ScrapeSession, job: tuple):
+        country, i = job
+        if api_client is not None:
+            fetched = api_client.get_data(country, row_limit, [chunks[i].phrases])
         else:
-            base_url = os.getenv('base_url')
-        try:
-            login, password = lines[0].split(':')
-        except ValueError:
-            raise InvalidFileData(f'Неверный формат данных в {os.getenv("credentials_filename")}')
-    if not third_party_source:
-        auth(driver, login, password)
-        time.sleep(AUTH_TIMEOUT)
-        if driver.current_url == os.getenv('login_url'):
-            auth(driver, login, password)
-    else:
-        driver.get(login_url)
-        print('Ожидание авторизации пользователем...')
-        while driver.current_url == login_url:
-            pass
-    print('Авторизация прошла успешно...')
-    url = f'{base_url.rstrip("/")}/keywords-explorer'
-    output_filename = os.getenv('output_filename', 'output.csv')
-    total_count = len(countries)
-    with open(output_filename, 'w', newline='', encoding='utf-8') as f:
-        writer = DictWriter(f, EXPORT_KEYS, delimiter=';')
-        writer.writeheader()
-    output = []
-    for i, country in enumerate(countries, 1):
-        raw_data = get_data(driver, url, country, row_limit, phrases_text_filename)
-        data, pairs = [], []
-        for row in raw_data:
-            if (row['Keyword'], row['Country']) not in pairs:
-                data.append(row)
-                pairs.append((row['Keyword'], row['Country']))
-        with open(output_filename, 'a', newline='', encoding='utf-8') as f:
-            writer = DictWriter(f, EXPORT_KEYS, delimiter=';')
+            # A session that has just exported a chunk of the same country keeps it selected
+            fetched = get_data(session.driver, session.url, country, row_limit, [chunks[i].filename],
+                               session.download_folder, selected=session.country == country)
+        for data in fetched:
+            journal.record(country, chunks[i].phrases, data)
+            cache.put(country, chunks[i].phrases, data)
+            results[country, i] = data
+        session.country = country
+
+    def merge(country: str):
+        dedup = Deduplicator(dedup_policy)
+        # The chunks are released as soon as they are merged, only the deduplicated table is kept
+        for i in range(len(chunks)):
+            dedup.extend(results.pop((country, i)))
+        return dedup.table
+
+    with CsvStreamWriter(output_filename, EXPORT_KEYS) as writer:
+        def write(country: str, cached: bool = False):
+            nonlocal done_count
+            done_count += 1
+            data = merged[country] = merge(country)
+            # Cached and resumed chunks are stored as well, after the same deduplication as the output
+            if database is not None:
+                database.upsert(data, output_filename)
             writer.writerows(data)
-        output += data
-        print(f'[{i}/{total_count}] {country}: {len(data)} rows')
-        time.sleep(float(f'{randint(1, 5)}.{randint(0, 9)}'))
-    driver.close()
-    return output, output_filename
+            print(f'[{done_count}/{total_count}] {country}: {len(data)} rows{" (cache)" if cached else ""}')
 
+        def on_result(job: tuple, _=None):
+            # A country is merged and written once its last chunk is exported
+            country = job[0]
+            remaining[country] -= 1
+            if not remaining[country]:
+                write(country)
 
-def process_data(data: list, filename: str, countries: dict, phrases: list, vol_k: float, dif_k: float):
-    processed_filename = f'{".".join(filename.split(".")[:-1])}_processed.csv'
-    output = dict()
-    length = len(phrases)
-    for i, ph in enumerate(phrases):
-        row = {'Запрос': ph['Запрос']}
-        results = [d for d in data if d['Keyword'].lower() == ph['Запрос'].lower()]
-        true_res = [x['Difficulty'] for x in results if x['Difficulty'] is not None]
-        max_dif = max(true_res) if true_res else 0
-        max_vols = dict()
         for country in countries:
-            true_res = [int(x['Volume']) for x in data if x['Country'] == country
-                        and x['Volume'] != '' and x['Volume'] is not None]
-            if country not in max_vols:
-                max_vols[country] = max(true_res) if true_res else 0
-            for d in results:
-                if d['Country'] == country and d['Volume'] is not None:
-                    row[f'Volume_{country}'] = 1 if 1 <= d['Volume'] <= 10 else d['Volume']
-                    break
-            else:
-                row[f'Volume_{country}'] = 0
-        for country in countries:
-            for d in results:
-                if d['Country'] == country and d['Difficulty'] is not None:
-                    row[f'Difficulty_{country}'] = d['Difficulty']
-                    break
-            else:
-                row[f'Difficulty_{country}'] = max_dif
-        row = {**row, **{f'Score_{country}': (vol_k * calculate_vol(row[f'Volume_{country}'], max_vols[country]) *
-                                              dif_k * calculate_dif(row[f'Difficulty_{country}']))
-                         for country in countries}}
-        row['Total_Score'] = sum(val * row[f'Score_{key}'] for key, val in countries.items())
-        if i == 0:
-            with open(processed_filename, 'w', newline='', encoding='utf-8') as f:
-                writer = DictWriter(f, list(row.keys()), delimiter=';')
-                writer.writeheader()
-        with open(processed_filename, 'a', newline='', encoding='utf-8') as f:
-            writer = DictWriter(f, list(row.keys()), delimiter=';')
-            cur_row = row.copy()
-            for key in 'Volume', 'Difficulty', 'Score':
-                for country in countries:
-                    cur_row[f'{key}_{country}'] = str(row[f'{key}_{country}']).replace('.', ',')
-            cur_row['Total_Score'] = str(row['Total_Score']).replace('.', ',')
-            writer.writerow(cur_row)
-        output[ph['Название']] = output.get(ph['Название'], []) + [row]
-        if (i + 1) % 100 == 0:
-            print(f'{i + 1}/{length}')
-    pivot_filename = f'{".".join(filename.split(".")[:-1])}_pivot.csv'
-    for i, items in enumerate(output.items()):
-        key, queries = items
-        fieldnames = ['Название'] + list(queries[0].keys())[1:]
-        if i == 0:
-            with open(pivot_filename, 'w', newline='', encoding='utf-8') as f:
-                writer = DictWriter(f, fieldnames, delimiter=';')
-                writer.writeheader()
-        row = {'Название': key, **{field: (max if 'Difficulty' in field else sum)(q[field] for q in queries)
-                                   for field in fieldnames[1:]}}
-        with open(pivot_filename, 'a', newline='', encoding='utf-8') as f:
-            cur_row = row.copy()
-            for key in 'Volume', 'Difficulty', 'Score':
-                for country in countries:
-                    cur_row[f'{key}_{country}'] = str(row[f'{key}_{country}']).replace('.', ',')
-            cur_row['Total_Score'] = str(row['Total_Score']).replace('.', ',')
-            writer = DictWriter(f, fieldnames, delimiter=';')
-            writer.writerow(cur_row)
-    print('\nOK')
\ No newline at end of file
+            if not remaining[country]:
+                write(country, cached=True)
+        if jobs and scheduler is not None:
+            scheduler.run(jobs, on_result, handle)
+        elif jobs:
+            with ScrapeScheduler(sessions_count, session_factory, handle) as scheduler:
+                scheduler.run(jobs, on_result)
+    return MetricsTable.concat(merged[country] for country in countries), output_filename
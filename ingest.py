@@ -0,0 +1,172 @@
+import mmap
+import os
+from array import array
+from csv import reader as csv_reader
+from io import TextIOWrapper
+
+from constants import COUNTRIES_CODES, PARALLEL_MIN_FILES
+from store import MetricsTable, MISSING
+
+COUNT_BLOCK_SIZE = 1 << 20
+READ_BLOCK_SIZE = 4 << 20
+CSV_BLOCK_ROWS = 1 << 16
+
+
+def map_file(f):
+    # An empty file can't be mapped, and it has nothing to read anyway
+    if not os.fstat(f.fileno()).st_size:
+        return None
+    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(buffer, 'madvise'):
+        buffer.madvise(mmap.MADV_SEQUENTIAL)
+    return buffer
+
+
+def count_lines(filename: str):
+    with open(filename, 'rb') as f:
+        buffer = map_file(f)
+        if buffer is None:
+            return 0
+        with buffer:
+            size = len(buffer)
+            count = sum(buffer[start:start + COUNT_BLOCK_SIZE].count(b'\n')
+                        for start in range(0, size, COUNT_BLOCK_SIZE))
+            return count + (buffer[size - 1] != ord('\n'))
+
+
+def assert_count_rows(filename, count):
+    length = count_lines(filename) - 1
+    scale = int(count) * 0.99 if int(count) * 0.99 >= 1 else count - 1
+    return True if scale <= length <= count else False
+
+
+def iter_line_blocks(buffer, block_size: int = READ_BLOCK_SIZE):
+    # Blocks of complete lines, so that lines can be split and checked a whole block at a time
+    rest = b''
+    for start in range(0, len(buffer), block_size):
+        block = rest + buffer[start:start + block_size]
+        end = block.rfind(b'\n') + 1
+        rest = block[end:]
+        if end:
+            yield block[:end - 1]
+    if rest:
+        yield rest
+
+
+def split_lines(lines: list, last_index: int):
+    # Line by line for blocks with short or empty lines
+    rows, padding = [], [b''] * (last_index + 1)
+    for line in lines:
+        fields = line.split(b',', last_index + 1)
+        if len(fields) <= last_index:
+            if not line.strip():
+                continue
+            fields += padding[len(fields):]
+        rows.append(fields)
+    return rows
+
+
+def iter_csv_blocks(f, offset: int, last_index: int, block_rows: int = CSV_BLOCK_ROWS):
+    # The csv module from offset to the end of the file, for quoted fields that may hold commas or line breaks
+    f.seek(offset)
+    text = TextIOWrapper(f, encoding='utf-8', newline='')
+    try:
+        rows, padding = [], [''] * (last_index + 1)
+        for fields in csv_reader(text):
+            if len(fields) <= last_index:
+                if not ''.join(fields).strip():
+                    continue
+                fields += padding[len(fields):]
+            rows.append(fields)
+            if len(rows) == block_rows:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+    finally:
+        text.detach()
+
+
+def read_export_table(filename: str, country: str = None, table: MetricsTable = None):
+    # Only Keyword, Country, Difficulty and Volume are decoded, straight from the mapped file into the
+    # table's columns without a dict per row. Blocks are split as bytes until the first quote: a quoted field
+    # may hold a line break, so from that block on the rest of the file goes through the csv module
+    table = table if table is not None else MetricsTable()
+    with open(filename, 'rb') as f:
+        buffer = map_file(f)
+        if buffer is None:
+            return table
+        with buffer:
+            header_end = buffer.find(b'\n')
+            header_end = len(buffer) if header_end == -1 else header_end + 1
+            fieldnames = [x.strip() for x in buffer[:header_end].decode('utf-8-sig').strip().split(',')]
+            keyword_index, difficulty_index = fieldnames.index('Keyword'), fieldnames.index('Difficulty')
+            volume_index = fieldnames.index('Volume')
+            country_index = fieldnames.index('Country') if country is None else 0
+            last_index = max(keyword_index, difficulty_index, volume_index, country_index)
+            country_ids = dict()
+
+            def append(rows: list, text: bool = False):
+                columns = dict()
+                for index in {keyword_index, difficulty_index, volume_index, country_index}:
+                    columns[index] = [fields[index] for fields in rows]
+                # With \r\n line ends the \r stays in the last field, which is only read if it's the last column
+                if not text and last_index == len(fieldnames) - 1:
+                    columns[last_index] = [value.rstrip(b'\r') for value in columns[last_index]]
+                keywords = columns[keyword_index]
+                table.keyword_column.extend(array('l', table.intern_keywords(
+                    keywords if text else [value.decode('utf-8') for value in keywords])))
+                if country is not None:
+                    table.country_column.extend(array('H', [table.intern_country(country)]) * len(rows))
+                else:
+                    for code in set(columns[country_index]) - country_ids.keys():
+                        name = code if text else code.decode('utf-8')
+                        country_ids[code] = table.intern_country(COUNTRIES_CODES.get(name, name))
+                    table.country_column.extend(array('H', [country_ids[code] for code in columns[country_index]]))
+                table.difficulty_column.extend(array('h', [int(value) if value else MISSING
+                                                           for value in columns[difficulty_index]]))
+                table.volume_column.extend(array('q', [int(value) if value else MISSING
+                                                       for value in columns[volume_index]]))
+
+            offset = header_end
+            for block in iter_line_blocks(memoryview(buffer)[header_end:]):
+                if b'"' in block:
+                    for rows in iter_csv_blocks(f, offset, last_index):
+                        append(rows, text=True)
+                    break
+                offset += len(block) + 1
+                lines = block.split(b'\n')
+                rows = [line.split(b',', last_index + 1) for line in lines]
+                if min(map(len, rows)) <= last_index:
+                    rows = split_lines(lines, last_index)
+                    if not rows:
+                        continue
+                append(rows)
+    return table
+
+
+def read_export(filename: str, country: str):
+    return read_export_table(filename, country)
+
+
+def list_export_files(folder: str):
+    return sorted(os.path.relpath(os.path.join(root, filename), folder)
+                  for root, _, filenames in os.walk(folder) for filename in filenames)
+
+
+def read_temp_export(filename: str):
+    return read_export_table(filename)
+
+
+def iter_exports(folder: str, files: list, workers: int = None):
+    # Yields (filename, rows) strictly in the order of files, whatever order the workers finish in
+    workers = workers or int(os.getenv('workers', 0)) or os.cpu_count() or 1
+    paths = [os.path.join(folder, filename) for filename in files]
+    if workers <= 1 or len(paths) < PARALLEL_MIN_FILES:
+        for filename, path in zip(files, paths):
+            yield filename, read_temp_export(path)
+        return
+    # Imported here: multiprocessing is slow to load and not needed for a handful of files
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(min(workers, len(paths))) as executor:
+        yield from zip(files, executor.map(read_temp_export, paths))
@@ -0,0 +1,87 @@
+import atexit
+import json
+import os
+import time
+from contextlib import nullcontext
+from threading import Lock
+
+NULL_SPAN = nullcontext()
+
+
+class Span:
+    def __init__(self, instrumentation, name: str):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.instrumentation.record(self.name, time.perf_counter() - self.start, exc_type is not None)
+
+
+class Instrumentation:
+    # Disabled by default: span() returns a shared no-op context and count() returns at once
+    def __init__(self):
+        self.enabled = False
+        self.report_filename = None
+        self.profile_filename = None
+        self.profiler = None
+        self.started = None
+        self.spans = dict()
+        self.counters = dict()
+        self.lock = Lock()
+
+    def setup(self, report_filename: str = None, profile_filename: str = None):
+        self.report_filename = report_filename or os.getenv('instrumentation_filename')
+        self.profile_filename = profile_filename or os.getenv('profile_filename')
+        if not self.report_filename and not self.profile_filename:
+            return
+        self.enabled = True
+        self.started = time.perf_counter()
+        if self.profile_filename:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        atexit.register(self.dump)
+
+    def span(self, name: str):
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    def record(self, name: str, seconds: float, failed: bool = False):
+        with self.lock:
+            span = self.spans.get(name)
+            if span is None:
+                span = self.spans[name] = {'count': 0, 'failed': 0, 'total_seconds': 0.0, 'max_seconds': 0.0}
+            span['count'] += 1
+            span['failed'] += failed
+            span['total_seconds'] += seconds
+            span['max_seconds'] = max(span['max_seconds'], seconds)
+
+    def count(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self):
+        with self.lock:
+            return {'wall_seconds': time.perf_counter() - self.started if self.started is not None else None,
+                    'spans': {name: dict(span) for name, span in self.spans.items()},
+                    'counters': dict(self.counters)}
+
+    def dump(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.profile_filename)
+            print(f'Профиль сохранён в {self.profile_filename}')
+        if self.report_filename:
+            with open(self.report_filename, 'w', encoding='utf-8') as f:
+                json.dump(self.report(), f, ensure_ascii=False, indent=2)
+            print(f'Отчёт по этапам сохранён в {self.report_filename}')
+
+
+instrumentation = Instrumentation()
+span = instrumentation.span
+count = instrumentation.count
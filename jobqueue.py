@@ -0,0 +1,182 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+from constants import JOB_LEASE, JOB_MAX_ATTEMPTS
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    country TEXT NOT NULL,
+    chunk INTEGER NOT NULL,
+    phrases TEXT NOT NULL,
+    row_limit INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    UNIQUE (project, country, chunk)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (project, status, id);
+CREATE TABLE IF NOT EXISTS results (
+    job_id INTEGER NOT NULL,
+    keyword TEXT NOT NULL,
+    difficulty INTEGER,
+    volume INTEGER
+);
+CREATE INDEX IF NOT EXISTS results_job ON results (job_id);
+'''
+
+JOB_FIELDS = 'id, country, chunk, phrases, row_limit, attempts'
+
+# A job whose phrases or row limit changed since it was submitted starts over, a failed one gets new attempts.
+# A job leased with the same phrases is left to its worker
+SUBMIT_QUERY = '''
+INSERT INTO jobs (project, country, chunk, phrases, row_limit) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (project, country, chunk) DO UPDATE SET
+    phrases = excluded.phrases, row_limit = excluded.row_limit, status = 'pending', worker = NULL,
+    lease_until = NULL, attempts = 0, error = NULL
+WHERE phrases != excluded.phrases OR row_limit != excluded.row_limit OR status = 'failed'
+'''
+
+
+def _job(values):
+    job_id, country, chunk, phrases, row_limit, attempts = values
+    return {'id': job_id, 'country': country, 'chunk': chunk, 'phrases': phrases.split('\n'),
+            'row_limit': row_limit, 'attempts': attempts}
+
+
+class JobQueue:
+    # (country, chunk) jobs of a project in a SQLite file that every worker can open, e.g. on a shared volume.
+    # A job is leased for a limited time: if its worker dies, the lease expires and the job is handed out again
+    def __init__(self, filename: str, lease_seconds: float = JOB_LEASE, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.filename = filename
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Rollback journal rather than WAL: WAL needs shared memory, which doesn't work over network file systems
+        self.connection = sqlite3.connect(filename, timeout=60, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=DELETE')
+        self.connection.executescript(SCHEMA)
+        self.lock = Lock()
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE takes the write lock at once, so two workers can't lease the same job
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+            self.connection.execute('COMMIT')
+
+    def submit(self, project: str, countries: list, chunks: list, row_limit: int, clear: bool = False):
+        # clear drops the project's jobs in the same transaction, so a worker never sees it without jobs
+        with self.transaction() as connection:
+            if clear:
+                connection.execute('DELETE FROM results WHERE job_id IN (SELECT id FROM jobs WHERE project = ?)',
+                                   (project,))
+                connection.execute('DELETE FROM jobs WHERE project = ?', (project,))
+            # Jobs of countries or chunks that are no longer in the project would be counted and merged
+            stale = [(job_id,) for job_id, country, chunk in connection.execute(
+                'SELECT id, country, chunk FROM jobs WHERE project = ?', (project,))
+                if country not in countries or chunk >= len(chunks)]
+            connection.executemany('DELETE FROM results WHERE job_id = ?', stale)
+            connection.executemany('DELETE FROM jobs WHERE id = ?', stale)
+            connection.executemany(SUBMIT_QUERY, ((project, country, i, '\n'.join(chunk.phrases), row_limit)
+                                                  for country in countries for i, chunk in enumerate(chunks)))
+            connection.execute("DELETE FROM results WHERE job_id IN "
+                               "(SELECT id FROM jobs WHERE project = ? AND status != 'done')", (project,))
+
+    def expire(self, connection, project: str, now: float):
+        # A job whose last lease expired has no attempts left: it fails like one whose worker reported an error
+        connection.execute(
+            "UPDATE jobs SET status = 'failed', lease_until = NULL, "
+            "error = 'аренда истекла, попыток: ' || attempts "
+            "WHERE project = ? AND status = 'leased' AND lease_until < ? AND attempts >= ?",
+            (project, now, self.max_attempts))
+
+    def lease(self, project: str, worker: str, limit: int = 1):
+        # Up to limit jobs of the same country, so that the worker selects the country once for all of them
+        now = time.time()
+        available = ("project = ? AND attempts < ? AND "
+                     "(status = 'pending' OR (status = 'leased' AND lease_until < ?))")
+        with self.transaction() as connection:
+            self.expire(connection, project, now)
+            first = connection.execute(f'SELECT country FROM jobs WHERE {available} ORDER BY id LIMIT 1',
+                                       (project, self.max_attempts, now)).fetchone()
+            if first is None:
+                return []
+            jobs = [_job(values) for values in connection.execute(
+                f'SELECT {JOB_FIELDS} FROM jobs WHERE {available} AND country = ? ORDER BY id LIMIT ?',
+                (project, self.max_attempts, now, first[0], limit))]
+            connection.executemany(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE id = ?", ((worker, now + self.lease_seconds, job['id']) for job in jobs))
+        return jobs
+
+    def renew(self, job_ids: list, worker: str):
+        with self.transaction() as connection:
+            connection.executemany(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                ((time.time() + self.lease_seconds, job_id, worker) for job_id in job_ids))
+
+    def complete(self, job_id: int, worker: str, rows):
+        # Only the current lease holder can commit: a worker whose lease has expired and been taken over
+        # by another one gets False and its rows are dropped
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = 'done', lease_until = NULL, error = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'leased'", (job_id, worker))
+            if cursor.rowcount == 0:
+                return False
+            connection.execute('DELETE FROM results WHERE job_id = ?', (job_id,))
+            connection.executemany('INSERT INTO results (job_id, keyword, difficulty, volume) VALUES (?, ?, ?, ?)',
+                                   ((job_id, row['Keyword'], row['Difficulty'], row['Volume']) for row in rows))
+        return True
+
+    def fail(self, job_id: int, worker: str, error: str):
+        with self.transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+                "lease_until = NULL, error = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (self.max_attempts, error, job_id, worker))
+
+    def progress(self, project: str):
+        with self.transaction() as connection:
+            self.expire(connection, project, time.time())
+            counts = dict(connection.execute(
+                'SELECT status, COUNT(*) FROM jobs WHERE project = ? GROUP BY status', (project,)).fetchall())
+        return {status: counts.get(status, 0) for status in ('pending', 'leased', 'done', 'failed')}
+
+    def errors(self, project: str):
+        with self.lock:
+            return self.connection.execute(
+                "SELECT country, chunk, error FROM jobs WHERE project = ? AND status != 'done' AND error IS NOT NULL "
+                "ORDER BY id", (project,)).fetchall()
+
+    def results(self, project: str, country: str):
+        # Rows of every chunk of the country, chunk by chunk in the order they were exported
+        with self.lock:
+            return [{'Keyword': keyword, 'Country': country, 'Difficulty': difficulty, 'Volume': volume}
+                    for keyword, difficulty, volume in self.connection.execute(
+                        'SELECT r.keyword, r.difficulty, r.volume FROM jobs j JOIN results r ON r.job_id = j.id '
+                        'WHERE j.project = ? AND j.country = ? ORDER BY j.chunk, r.rowid', (project, country))]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def open_queue(filename: str = None):
+    return JobQueue(filename or os.getenv('queue_filename', 'queue.sqlite3'))
@@ -1,49 +1,124 @@
 import os
-from csv import DictWriter, DictReader
+import time
+from argparse import ArgumentParser
 
 from dotenv import load_dotenv
 
-from utils import retrieve_countries, retrieve_phrases
-from general import process_data
-from constants import EXPORT_KEYS, COUNTRIES_CODES
+from database import open_database
+from dedup import Deduplicator
+from utils import retrieve_countries, retrieve_phrases, write_phrases_text
+from ingest import list_export_files, iter_exports
+from instrumentation import instrumentation, span, count
+from scoring import KeywordIndex, score_phrases, write_outputs, output_path, process_data, save_matrix
+from store import MetricsTable
+from writers import CsvStreamWriter
+from constants import EXPORT_KEYS, WATCH_INTERVAL
 
 
-def main():
+def scan_exports(folder: str):
+    stats = dict()
+    for filename in list_export_files(folder):
+        if filename.endswith('.tmp') or filename.endswith('.crdownload'):
+            continue
+        try:
+            stat = os.stat(os.path.join(folder, filename))
+        except FileNotFoundError:
+            continue
+        stats[filename] = stat.st_mtime_ns, stat.st_size
+    return stats
+
+
+def watch(countries: dict, phrases: list, temp_folder: str, output_filename: str, vol_k: float, dif_k: float,
+          workers: int = None, interval: float = WATCH_INTERVAL):
+    from watcher import FolderWatcher
+    dedup_policy = os.getenv('dedup_policy', 'first')
+    positions = dict()
+    for i, ph in enumerate(phrases):
+        positions.setdefault(ph['Запрос'].lower(), []).append(i)
+    file_stats, file_tables, previous_stats = dict(), dict(), None
+    rows, max_vols = None, None
+    print(f'Ожидание файлов в {temp_folder} (Ctrl+C для выхода)...')
+    with FolderWatcher(temp_folder) as watcher:
+        while True:
+            stats = scan_exports(temp_folder)
+            # A file is taken once it stays the same between two scans, so half-written exports are skipped
+            ready = [filename for filename, stat in stats.items() if file_stats.get(filename) != stat
+                     and (previous_stats is None or previous_stats.get(filename) == stat)]
+            removed = [filename for filename in file_stats if filename not in stats]
+            previous_stats = stats
+            if ready or removed:
+                touched = set()
+                for filename in removed:
+                    touched.update(keyword.lower() for keyword in file_tables.pop(filename).keywords)
+                    del file_stats[filename]
+                for filename, file_rows in iter_exports(temp_folder, ready, workers):
+                    if filename in file_tables:
+                        touched.update(keyword.lower() for keyword in file_tables[filename].keywords)
+                    file_tables[filename] = MetricsTable(file_rows)
+                    file_stats[filename] = stats[filename]
+                    touched.update(keyword.lower() for keyword in file_tables[filename].keywords)
+                dedup = Deduplicator(dedup_policy)
+                for filename in sorted(file_tables):
+                    dedup.extend(file_tables[filename])
+                index = KeywordIndex(dedup.table, set(positions))
+                new_max_vols = {country: index.get_max_vol(country) for country in countries}
+                if rows is None or new_max_vols != max_vols:
+                    affected = list(range(len(phrases)))
+                    rows = score_phrases([ph['Запрос'] for ph in phrases], index, countries, vol_k, dif_k)
+                else:
+                    affected = sorted(i for keyword in touched.intersection(positions) for i in positions[keyword])
+                    for i, row in zip(affected, score_phrases([phrases[i]['Запрос'] for i in affected],
+                                                              index, countries, vol_k, dif_k)):
+                        rows[i] = row
+                max_vols = new_max_vols
+                with CsvStreamWriter(output_filename, EXPORT_KEYS, atomic=True) as writer:
+                    writer.writerows(dedup.table)
+                write_outputs(rows, phrases, countries, output_filename)
+                save_matrix(output_path(output_filename, 'matrix.json'), rows, phrases, countries, index)
+                print(f'[{time.strftime("%H:%M:%S")}] {len(ready)} new/changed, {len(removed)} removed files, '
+                      f'{len(dedup)} rows, {len(affected)} phrases rescored')
+            watcher.wait(interval)
+
+
+def main(workers: int = None, watch_mode: bool = False):
     countries = {c['Страна']: float(c['Коэффициент']) for c in retrieve_countries(os.getenv('countries_filename'))}
     phrases = retrieve_phrases(os.getenv('phrases_filename'))
-    phrases_text_filename = '.'.join(os.getenv('phrases_filename').split('.')[:-1]) + '.txt'
-    with open(phrases_text_filename, 'w', encoding='utf-8') as f:
-        f.write('\n'.join([ph['Запрос'] for ph in phrases]))
+    write_phrases_text(phrases, os.getenv('phrases_filename'))
     output_filename = os.getenv('output_filename', 'output.csv')
     temp_folder = os.getenv('temp_folder', 'temp')
-    files = os.listdir(temp_folder)
-    if not files:
+    files = list_export_files(temp_folder)
+    if not files and not watch_mode:
         return print(f'Папка {temp_folder} пуста')
     total_count = len(files)
     vol_k, dif_k = map(float, input('Введите коэффициенты Volume и Difficulty через пробел '
                                     '(если число вещественное, то дробную часть записывать через "."):\n').split())
-    with open(output_filename, 'w', newline='', encoding='utf-8') as f:
-        writer = DictWriter(f, EXPORT_KEYS, delimiter=';')
-        writer.writeheader()
-    data = []
-    for i, filename in enumerate(files, 1):
-        cur_data, pairs = [], []
-        with open(os.path.join(temp_folder, filename), encoding='utf-8') as f:
-            for d in DictReader(f, f.readline().strip().split(','), delimiter=','):
-                if (d['Keyword'], d['Country']) not in pairs:
-                    row = {'Keyword': d['Keyword'], 'Country': COUNTRIES_CODES.get(d['Country'], d['Country']),
-                           'Difficulty': int(d['Difficulty']) if d['Difficulty'] else None,
-                           'Volume': int(d['Volume']) if d['Volume'] else None}
-                    cur_data.append(row)
-                    pairs.append((row['Keyword'], row['Country']))
-        with open(output_filename, 'a', newline='', encoding='utf-8') as f:
-            writer = DictWriter(f, EXPORT_KEYS, delimiter=';')
-            writer.writerows(cur_data)
-        data += cur_data
-        print(f'[{i}/{total_count}] {filename}: {len(data)} rows')
-    process_data(data, output_filename, countries, phrases, vol_k, dif_k)
+    if watch_mode:
+        return watch(countries, phrases, temp_folder, output_filename, vol_k, dif_k, workers)
+    dedup = Deduplicator(os.getenv('dedup_policy', 'first'))
+    database = open_database()
+    with span('ingest'):
+        for i, (filename, rows) in enumerate(iter_exports(temp_folder, files, workers), 1):
+            dedup.extend(rows)
+            count('rows_parsed', len(rows))
+            print(f'[{i}/{total_count}] {filename}: {len(dedup)} rows')
+    data = dedup.table
+    if database is not None:
+        database.clear_project(output_filename)
+        database.upsert(data, output_filename)
+    with CsvStreamWriter(output_filename, EXPORT_KEYS) as writer:
+        writer.writerows(data)
+    process_data(data if database is None else database.project(output_filename), output_filename, countries,
+                 phrases, vol_k, dif_k)
 
 
 if __name__ == '__main__':
     load_dotenv()
-    main()
\ No newline at end of file
+    parser = ArgumentParser()
+    parser.add_argument('--workers', type=int, help='количество процессов для чтения файлов выгрузки')
+    parser.add_argument('--watch', action='store_true',
+                        help='следить за папкой выгрузок и пересчитывать результаты при появлении новых файлов')
+    parser.add_argument('--report', help='сохранить в JSON время этапов и счётчики')
+    parser.add_argument('--profile', help='сохранить профиль cProfile')
+    args = parser.parse_args()
+    instrumentation.setup(args.report, args.profile)
+    main(args.workers, args.watch)
\ No newline at end of file
@@ -1,18 +1,23 @@
 import os
+from argparse import ArgumentParser
 from dotenv import load_dotenv
 from shutil import rmtree
 
-from general import parse, process_data
-from utils import retrieve_countries, retrieve_phrases
+from browser import open_api_client
+from general import parse
+from scoring import process_data
+from database import open_database
+from instrumentation import instrumentation
+from utils import retrieve_countries, retrieve_phrases, write_phrases_text
 
 
-def main(row_limit: int = 5000):
+def main(row_limit: int = 5000, resume: bool = False, api: bool = False):
     temp_folder = os.getenv('temp_folder', 'temp')
-    if os.path.exists(temp_folder):
+    if os.path.exists(temp_folder) and not resume:
         if input(f'Папка {temp_folder} будет перезаписана. Продолжить? (y\\n) ').lower() != 'y':
             return
         rmtree(temp_folder)
-    os.mkdir(temp_folder)
+    os.makedirs(temp_folder, exist_ok=True)
     vol_k, dif_k = map(float, input('Введите коэффициенты Volume и Difficulty через пробел '
                                     '(если число вещественное, то дробную часть записывать через "."):\n').split())
     row_answer = input(f'Введите лимит строк (по умолчанию - {row_limit}, для сего значения нажмите Enter): ')
@@ -23,13 +28,28 @@ def main(row_limit: int = 5000):
             raise ValueError('Неверный формат числа строк')
     countries = {c['Страна']: float(c['Коэффициент']) for c in retrieve_countries(os.getenv('countries_filename'))}
     phrases = retrieve_phrases(os.getenv('phrases_filename'))
-    phrases_text_filename = '.'.join(os.getenv('phrases_filename').split('.')[:-1]) + '.txt'
-    with open(phrases_text_filename, 'w', encoding='utf-8') as f:
-        f.write('\n'.join([ph['Запрос'] for ph in phrases]))
-    data, filename = parse(list(countries.keys()), row_limit, temp_folder, phrases_text_filename)
-    process_data(data, filename, countries, phrases, vol_k, dif_k)
+    phrases_text_filename = write_phrases_text(phrases, os.getenv('phrases_filename'))
+    database = open_database()
+    api_client = open_api_client(temp_folder) if api else None
+    try:
+        data, filename = parse(list(countries.keys()), row_limit, temp_folder, phrases_text_filename, resume=resume,
+                               database=database, api_client=api_client)
+    finally:
+        if api_client is not None:
+            api_client.close()
+    process_data(data if database is None else database.project(filename), filename, countries, phrases,
+                 vol_k, dif_k)
 
 
 if __name__ == '__main__':
     load_dotenv()
-    main()
\ No newline at end of file
+    parser = ArgumentParser()
+    parser.add_argument('--resume', action='store_true',
+                        help='продолжить прерванный запуск, не перезаписывая уже выгруженные страны')
+    parser.add_argument('--api', action='store_true',
+                        help='после входа через браузер получать данные напрямую через API (api_url)')
+    parser.add_argument('--report', help='сохранить в JSON время этапов и счётчики')
+    parser.add_argument('--profile', help='сохранить профиль cProfile')
+    args = parser.parse_args()
+    instrumentation.setup(args.report, args.profile)
+    main(resume=args.resume, api=args.api)
\ No newline at end of file
@@ -0,0 +1,19 @@
+from collections import namedtuple
+
+from utils import read_phrases_text
+
+PhraseChunk = namedtuple('PhraseChunk', ['filename', 'phrases'])
+
+
+def plan_chunks(phrases_text_filename: str, row_limit: int):
+    phrases = [ph for ph in read_phrases_text(phrases_text_filename) if ph]
+    if len(phrases) <= row_limit:
+        return [PhraseChunk(phrases_text_filename, phrases)]
+    base_filename = '.'.join(phrases_text_filename.split('.')[:-1])
+    chunks = []
+    for i, start in enumerate(range(0, len(phrases), row_limit), 1):
+        chunk = PhraseChunk(f'{base_filename}_chunk_{i}.txt', phrases[start:start + row_limit])
+        with open(chunk.filename, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(chunk.phrases))
+        chunks.append(chunk)
+    return chunks
@@ -0,0 +1,42 @@
+import heapq
+
+from writers import CsvStreamWriter
+
+TOP_FIELDNAMES = ['Рейтинг', 'Место', 'Запрос', 'Название', 'Score', 'Total_Score']
+PIVOT_TOP_FIELDNAMES = ['Рейтинг', 'Место', 'Название', 'Score', 'Total_Score']
+
+
+class TopK:
+    # Bounded min-heap of the k best items seen so far. On equal scores the earlier item wins, so the result
+    # is the same as the first k rows of a stable sort by score
+    def __init__(self, k: int):
+        self.k = k
+        self.heap = []
+        self.added = 0
+
+    def add(self, score, item):
+        entry = (score, -self.added, item)
+        self.added += 1
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+
+    def items(self):
+        return [(score, item) for score, _, item in sorted(self.heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+class Ranking:
+    # One TopK per score column, fed row by row while the outputs are written
+    def __init__(self, fields: list, k: int):
+        self.tops = {field: TopK(k) for field in fields}
+
+    def add(self, row: dict, item):
+        for field, top in self.tops.items():
+            top.add(row[field], item)
+
+    def write(self, filename: str, fieldnames: list):
+        with CsvStreamWriter(filename, fieldnames, decimal_comma=True, atomic=True) as writer:
+            for field, top in self.tops.items():
+                for place, (score, item) in enumerate(top.items(), 1):
+                    writer.writerow({'Рейтинг': field, 'Место': place, 'Score': score, **item})
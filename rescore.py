@@ -0,0 +1,31 @@
+import os
+from argparse import ArgumentParser
+
+from dotenv import load_dotenv
+
+from scoring import write_outputs, output_path, load_matrix, rescore_rows
+from utils import retrieve_countries
+
+
+def main(vol_k: float = None, dif_k: float = None, countries_filename: str = None, matrix_filename: str = None):
+    output_filename = os.getenv('output_filename', 'output.csv')
+    matrix = load_matrix(matrix_filename or output_path(output_filename, 'matrix.json'))
+    countries = {c['Страна']: float(c['Коэффициент'])
+                 for c in retrieve_countries(countries_filename or os.getenv('countries_filename'))}
+    if vol_k is None or dif_k is None:
+        vol_k, dif_k = map(float, input('Введите коэффициенты Volume и Difficulty через пробел '
+                                        '(если число вещественное, то дробную часть записывать через "."):\n').split())
+    phrases = [{'Запрос': query, 'Название': name} for query, name in matrix['phrases']]
+    write_outputs(rescore_rows(matrix, countries, vol_k, dif_k), phrases, countries, output_filename)
+    print('\nOK')
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    parser = ArgumentParser(description='Пересчёт Score и сводной таблицы по данным прошлого запуска')
+    parser.add_argument('--vol-k', type=float, help='коэффициент Volume')
+    parser.add_argument('--dif-k', type=float, help='коэффициент Difficulty')
+    parser.add_argument('--countries', help='файл со странами и их коэффициентами')
+    parser.add_argument('--matrix', help='файл с сохранёнными данными (по умолчанию <output>_matrix.json)')
+    args = parser.parse_args()
+    main(args.vol_k, args.dif_k, args.countries, args.matrix)
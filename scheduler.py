@@ -0,0 +1,109 @@
+import os
+import time
+from queue import Queue, Empty
+from random import uniform
+from threading import Thread, Lock
+
+
+class RateLimiter:
+    def __init__(self, min_delay: float = None, max_delay: float = None):
+        self.min_delay = min_delay if min_delay is not None else float(os.getenv('min_delay', 1))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv('max_delay', 6))
+        self.last_time = None
+
+    def wait(self):
+        if self.last_time is not None:
+            delay = uniform(self.min_delay, self.max_delay) - (time.time() - self.last_time)
+            if delay > 0:
+                time.sleep(delay)
+
+    def done(self):
+        self.last_time = time.time()
+
+
+class ScrapeSession:
+    def __init__(self, driver, url: str, download_folder: str, rate_limiter: RateLimiter = None):
+        self.driver = driver
+        self.url = url
+        self.download_folder = download_folder
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # The country selected on the page by the last finished job
+        self.country = None
+
+    def close(self):
+        # quit() also stops chromedriver and releases the profile lock, close() only closes the window
+        self.driver.quit()
+
+
+# One worker thread per browser session. session_factory(number) returns an authorized ScrapeSession,
+# handler(session, job) scrapes a job and on_result(job, result) is called under a lock as jobs complete.
+# Sessions stay open between run() calls until close(), so several projects can share one login
+class ScrapeScheduler:
+    def __init__(self, sessions_count: int, session_factory, handler=None):
+        self.sessions_count = max(1, sessions_count)
+        self.session_factory = session_factory
+        self.handler = handler
+        self.sessions = [None] * self.sessions_count
+        self.lock = Lock()
+
+    def run(self, jobs: list, on_result=None, handler=None):
+        handler = handler or self.handler
+        queue = Queue()
+        for i, job in enumerate(jobs):
+            queue.put((i, job))
+        results, errors = [None] * len(jobs), []
+
+        def work(number: int):
+            try:
+                if self.sessions[number] is None:
+                    self.sessions[number] = self.session_factory(number)
+                session = self.sessions[number]
+                while not errors:
+                    try:
+                        i, job = queue.get_nowait()
+                    except Empty:
+                        return
+                    session.rate_limiter.wait()
+                    try:
+                        results[i] = handler(session, job)
+                    except Exception:
+                        # The browser may be left in any state: the next run starts this worker with a new one
+                        self.discard(number)
+                        raise
+                    finally:
+                        session.rate_limiter.done()
+                    if on_result is not None:
+                        with self.lock:
+                            on_result(job, results[i])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [Thread(target=work, args=(number,), daemon=True)
+                   for number in range(min(self.sessions_count, len(jobs)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    def discard(self, number: int):
+        session, self.sessions[number] = self.sessions[number], None
+        if session is not None:
+            try:
+                session.close()
+            except Exception:
+                pass
+
+    def close(self):
+        for i, session in enumerate(self.sessions):
+            if session is not None:
+                session.close()
+                self.sessions[i] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
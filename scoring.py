@@ -0,0 +1,190 @@
+import json
+import os
+
+from database import ProjectMetrics
+from instrumentation import span
+from ranking import Ranking, TOP_FIELDNAMES, PIVOT_TOP_FIELDNAMES
+from store import MetricsTable
+from utils import calculate_vol, calculate_dif
+from writers import CsvStreamWriter
+
+
+class KeywordIndex:
+    # Only keywords from only_keywords (lowercase) are indexed when it's given,
+    # the per-country max volumes are always computed over all the rows
+    def __init__(self, data=(), only_keywords: set = None):
+        # keyword.lower() -> [{country: volume}, {country: difficulty}, max difficulty]
+        self.keywords = dict()
+        self.max_vols = dict()
+        self.only_keywords = only_keywords
+        if isinstance(data, MetricsTable):
+            for values in data.iter_values():
+                self.add_values(*values)
+        elif isinstance(data, ProjectMetrics):
+            # Only the rows of the wanted keywords are read, the max volumes come from all the project's rows
+            for values in data.iter_values(only_keywords):
+                self.add_values(*values)
+            self.max_vols = data.max_volumes()
+        else:
+            for row in data:
+                self.add(row)
+
+    def add(self, row: dict):
+        self.add_values(row['Keyword'], row['Country'], row['Difficulty'], row['Volume'])
+
+    def add_values(self, keyword: str, country: str, dif, vol):
+        if vol is not None and vol != '':
+            vol = int(vol)
+            if vol > self.max_vols.get(country, vol - 1):
+                self.max_vols[country] = vol
+        keyword = keyword.lower()
+        if self.only_keywords is not None and keyword not in self.only_keywords:
+            return
+        entry = self.keywords.get(keyword)
+        if entry is None:
+            entry = self.keywords[keyword] = [dict(), dict(), None]
+        if vol is not None:
+            entry[0].setdefault(country, vol)
+        if dif is not None:
+            entry[1].setdefault(country, dif)
+            if entry[2] is None or dif > entry[2]:
+                entry[2] = dif
+
+    def get(self, keyword: str):
+        entry = self.keywords.get(keyword.lower())
+        if entry is None:
+            return dict(), dict(), 0
+        volumes, difficulties, max_dif = entry
+        return volumes, difficulties, max_dif if max_dif is not None else 0
+
+    def get_max_vol(self, country: str):
+        return self.max_vols.get(country, 0)
+
+
+def score_phrase(query: str, index: KeywordIndex, countries: dict, vol_k: float, dif_k: float):
+    volumes, difficulties, max_dif = index.get(query)
+    row = {'Запрос': query}
+    for country in countries:
+        vol = volumes.get(country, 0)
+        row[f'Volume_{country}'] = 1 if 1 <= vol <= 10 else vol
+    for country in countries:
+        row[f'Difficulty_{country}'] = difficulties.get(country, max_dif)
+    for country in countries:
+        row[f'Score_{country}'] = (vol_k * calculate_vol(row[f'Volume_{country}'], index.get_max_vol(country)) *
+                                   dif_k * calculate_dif(row[f'Difficulty_{country}']))
+    row['Total_Score'] = sum(val * row[f'Score_{key}'] for key, val in countries.items())
+    return row
+
+
+def score_phrases(queries: list, index: KeywordIndex, countries: dict, vol_k: float, dif_k: float):
+    return [score_phrase(query, index, countries, vol_k, dif_k) for query in queries]
+
+
+def score_fieldnames(countries: dict):
+    return ['Запрос'] + [f'{key}_{country}' for key in ('Volume', 'Difficulty', 'Score')
+                         for country in countries] + ['Total_Score']
+
+
+def output_path(filename: str, suffix: str):
+    return f'{".".join(filename.split(".")[:-1])}_{suffix}'
+
+
+def write_outputs(rows: list, phrases: list, countries: dict, filename: str, top_k: int = None):
+    length = len(phrases)
+    fieldnames = score_fieldnames(countries)
+    top_k = top_k if top_k is not None else int(os.getenv('top_k', 100))
+    # Best phrases and groups by Total_Score and by every Score_{country}, kept in bounded heaps on the way
+    ranked_fields = ['Total_Score'] + [f'Score_{country}' for country in countries]
+    top, pivot_top = Ranking(ranked_fields, top_k), Ranking(ranked_fields, top_k)
+    # Running max for the Difficulty columns and running sums for the rest, one accumulator per group
+    aggregates = [(field, 'Difficulty' in field) for field in fieldnames[1:]]
+    groups = dict()
+    with CsvStreamWriter(output_path(filename, 'processed.csv'), fieldnames, decimal_comma=True,
+                         atomic=True) as writer:
+        for i, (ph, row) in enumerate(zip(phrases, rows)):
+            writer.writerow(row)
+            if top_k:
+                top.add(row, {'Запрос': ph['Запрос'], 'Название': ph['Название'], 'Total_Score': row['Total_Score']})
+            group = groups.get(ph['Название'])
+            if group is None:
+                groups[ph['Название']] = {field: row[field] if is_max else 0 + row[field]
+                                          for field, is_max in aggregates}
+            else:
+                for field, is_max in aggregates:
+                    if is_max:
+                        if row[field] > group[field]:
+                            group[field] = row[field]
+                    else:
+                        group[field] += row[field]
+            if (i + 1) % 100 == 0:
+                print(f'{i + 1}/{length}')
+    fieldnames = ['Название'] + fieldnames[1:]
+    with CsvStreamWriter(output_path(filename, 'pivot.csv'), fieldnames, decimal_comma=True, atomic=True) as writer:
+        for key, group in groups.items():
+            writer.writerow({'Название': key, **group})
+            if top_k:
+                pivot_top.add(group, {'Название': key, 'Total_Score': group['Total_Score']})
+    if top_k:
+        top.write(output_path(filename, 'top.csv'), TOP_FIELDNAMES)
+        pivot_top.write(output_path(filename, 'pivot_top.csv'), PIVOT_TOP_FIELDNAMES)
+
+
+def save_matrix(filename: str, rows: list, phrases: list, countries: dict, index: KeywordIndex):
+    volumes = [[row[f'Volume_{country}'] for country in countries] for row in rows]
+    difficulties = [[row[f'Difficulty_{country}'] for country in countries] for row in rows]
+    max_vols = [index.get_max_vol(country) for country in countries]
+    matrix = {'countries': list(countries), 'phrases': [[ph['Запрос'], ph['Название']] for ph in phrases],
+              'volumes': volumes, 'difficulties': difficulties,
+              'norm_volumes': [[calculate_vol(vol, max_vol) for vol, max_vol in zip(vols, max_vols)]
+                               for vols in volumes],
+              'norm_difficulties': [[calculate_dif(dif) for dif in difs] for difs in difficulties]}
+    with open(f'{filename}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(matrix, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(f'{filename}.tmp', filename)
+
+
+def load_matrix(filename: str):
+    with open(filename, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def rescore_rows(matrix: dict, countries: dict, vol_k: float, dif_k: float):
+    # Score rows from a saved matrix, same as score_phrases with the countries and coefficients given
+    columns = {country: j for j, country in enumerate(matrix['countries'])}
+    missing = [country for country in countries if country not in columns]
+    if missing:
+        raise ValueError(f'В сохранённых данных нет стран: {", ".join(missing)}')
+    indexes = [columns[country] for country in countries]
+    rows = []
+    for (query, _), vols, difs, norm_vols, norm_difs in zip(matrix['phrases'], matrix['volumes'],
+                                                            matrix['difficulties'], matrix['norm_volumes'],
+                                                            matrix['norm_difficulties']):
+        row = {'Запрос': query}
+        for country, j in zip(countries, indexes):
+            row[f'Volume_{country}'] = vols[j]
+        for country, j in zip(countries, indexes):
+            row[f'Difficulty_{country}'] = difs[j]
+        for country, j in zip(countries, indexes):
+            row[f'Score_{country}'] = vol_k * norm_vols[j] * dif_k * norm_difs[j]
+        row['Total_Score'] = sum(val * row[f'Score_{key}'] for key, val in countries.items())
+        rows.append(row)
+    return rows
+
+
+def process_data(data: list, filename: str, countries: dict, phrases: list, vol_k: float, dif_k: float,
+                 backend: str = None):
+    with span('index'):
+        index = KeywordIndex(data, {ph['Запрос'].lower() for ph in phrases})
+    backend = backend or os.getenv('scoring_backend', 'python')
+    if backend == 'numpy':
+        from vectorized import score_phrases as score
+    elif backend == 'python':
+        score = score_phrases
+    else:
+        raise ValueError(f'Неизвестный способ подсчёта: {backend}')
+    with span('scoring'):
+        rows = score([ph['Запрос'] for ph in phrases], index, countries, vol_k, dif_k)
+    with span('write_outputs'):
+        write_outputs(rows, phrases, countries, filename)
+        save_matrix(output_path(filename, 'matrix.json'), rows, phrases, countries, index)
+    print('\nOK')
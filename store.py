@@ -0,0 +1,89 @@
+from array import array
+from itertools import islice
+
+MISSING = -1
+
+
+class MetricsTable:
+    # Keyword/Country/Difficulty/Volume rows kept as array columns: keywords and countries are stored once
+    # in string tables and referenced by id, missing Difficulty/Volume values are stored as MISSING
+    def __init__(self, rows=()):
+        self.keywords, self.keyword_ids = [], dict()
+        self.countries, self.country_ids = [], dict()
+        self.keyword_column = array('l')
+        self.country_column = array('H')
+        self.difficulty_column = array('h')
+        self.volume_column = array('q')
+        self.extend(rows)
+
+    def intern_keyword(self, keyword: str):
+        keyword_id = self.keyword_ids.get(keyword)
+        if keyword_id is None:
+            keyword_id = self.keyword_ids[keyword] = len(self.keywords)
+            self.keywords.append(keyword)
+        return keyword_id
+
+    def intern_keywords(self, keywords):
+        # intern_keyword for a whole column: new keywords are added to the dict in order and are its last keys
+        keyword_ids, count = self.keyword_ids, len(self.keyword_ids)
+        ids = [keyword_ids.setdefault(keyword, len(keyword_ids)) for keyword in keywords]
+        if len(keyword_ids) > count:
+            self.keywords.extend(reversed(list(islice(reversed(keyword_ids), len(keyword_ids) - count))))
+        return ids
+
+    def intern_country(self, country: str):
+        country_id = self.country_ids.get(country)
+        if country_id is None:
+            country_id = self.country_ids[country] = len(self.countries)
+            self.countries.append(country)
+        return country_id
+
+    def append_ids(self, keyword_id: int, country_id: int, difficulty, volume):
+        self.keyword_column.append(keyword_id)
+        self.country_column.append(country_id)
+        self.difficulty_column.append(MISSING if difficulty is None else difficulty)
+        self.volume_column.append(MISSING if volume is None else volume)
+
+    def append(self, keyword: str, country: str, difficulty, volume):
+        self.append_ids(self.intern_keyword(keyword), self.intern_country(country), difficulty, volume)
+
+    def add(self, row: dict):
+        self.append(row['Keyword'], row['Country'], row['Difficulty'], row['Volume'])
+
+    def extend(self, rows):
+        if isinstance(rows, MetricsTable):
+            for values in rows.iter_values():
+                self.append(*values)
+        else:
+            for row in rows:
+                self.add(row)
+        return self
+
+    def set_values(self, position: int, difficulty, volume):
+        self.difficulty_column[position] = MISSING if difficulty is None else difficulty
+        self.volume_column[position] = MISSING if volume is None else volume
+
+    def get_volume(self, position: int):
+        volume = self.volume_column[position]
+        return None if volume == MISSING else volume
+
+    def iter_values(self):
+        keywords, countries = self.keywords, self.countries
+        for keyword_id, country_id, difficulty, volume in zip(self.keyword_column, self.country_column,
+                                                               self.difficulty_column, self.volume_column):
+            yield (keywords[keyword_id], countries[country_id],
+                   None if difficulty == MISSING else difficulty, None if volume == MISSING else volume)
+
+    def __iter__(self):
+        for keyword, country, difficulty, volume in self.iter_values():
+            yield {'Keyword': keyword, 'Country': country, 'Difficulty': difficulty, 'Volume': volume}
+
+    def __len__(self):
+        return len(self.keyword_column)
+
+    @classmethod
+    def concat(cls, tables):
+        table = cls()
+        for other in tables:
+            table.extend(other)
+        return table
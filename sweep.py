@@ -0,0 +1,103 @@
+import heapq
+import json
+import os
+from argparse import ArgumentParser
+from itertools import product
+
+from dotenv import load_dotenv
+
+from scoring import output_path, load_matrix
+from utils import retrieve_countries
+from writers import CsvStreamWriter
+
+SUMMARY_FIELDNAMES = ['Место', 'Запрос', 'Название', 'Total_Score']
+
+
+def load_weights(weights):
+    if isinstance(weights, dict):
+        return {country: float(val) for country, val in weights.items()}
+    return {c['Страна']: float(c['Коэффициент']) for c in retrieve_countries(weights)}
+
+
+def expand_configs(config: dict, default_weights: str):
+    # Either an explicit list of configurations or a grid of vol_k x dif_k x weights
+    if 'configs' in config:
+        return [{'vol_k': float(c['vol_k']), 'dif_k': float(c['dif_k']), 'weights': c.get('weights', default_weights)}
+                for c in config['configs']]
+    return [{'vol_k': float(vol_k), 'dif_k': float(dif_k), 'weights': weights}
+            for weights, vol_k, dif_k in product(config.get('weights', [default_weights]),
+                                                 config['vol_k'], config['dif_k'])]
+
+
+def sweep_totals(matrix: dict, configs: list):
+    columns = {country: j for j, country in enumerate(matrix['countries'])}
+    for config in configs:
+        missing = [country for country in config['countries'] if country not in columns]
+        if missing:
+            raise ValueError(f'В сохранённых данных нет стран: {", ".join(missing)}')
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    # Same operand order as process_data, so every total matches a full run with the same settings
+    if np is not None:
+        norm_vols = np.array(matrix['norm_volumes'], dtype=np.float64).reshape(-1, len(columns))
+        norm_difs = np.array(matrix['norm_difficulties'], dtype=np.float64).reshape(-1, len(columns))
+        results = []
+        for config in configs:
+            totals = np.zeros(norm_vols.shape[0], dtype=np.float64)
+            for country, val in config['countries'].items():
+                j = columns[country]
+                totals = totals + val * (config['vol_k'] * norm_vols[:, j] * config['dif_k'] * norm_difs[:, j])
+            results.append(totals.tolist())
+        return results
+    weights = [[(columns[country], val) for country, val in config['countries'].items()] for config in configs]
+    results = [[] for _ in configs]
+    for norm_vols, norm_difs in zip(matrix['norm_volumes'], matrix['norm_difficulties']):
+        for config, config_weights, totals in zip(configs, weights, results):
+            vol_k, dif_k = config['vol_k'], config['dif_k']
+            totals.append(sum(val * (vol_k * norm_vols[j] * dif_k * norm_difs[j]) for j, val in config_weights))
+    return results
+
+
+def write_summary(filename: str, matrix: dict, totals: list, top: int = None):
+    # nlargest keeps equal totals in input order, same as the stable sort used without --top
+    if top:
+        ranked = heapq.nlargest(top, range(len(totals)), key=totals.__getitem__)
+    else:
+        ranked = sorted(range(len(totals)), key=lambda i: -totals[i])
+    with CsvStreamWriter(filename, SUMMARY_FIELDNAMES, decimal_comma=True) as writer:
+        for place, i in enumerate(ranked, 1):
+            query, name = matrix['phrases'][i]
+            writer.writerow({'Место': place, 'Запрос': query, 'Название': name, 'Total_Score': totals[i]})
+
+
+def main(config_filename: str, matrix_filename: str = None, top: int = None):
+    output_filename = os.getenv('output_filename', 'output.csv')
+    matrix = load_matrix(matrix_filename or output_path(output_filename, 'matrix.json'))
+    with open(config_filename, encoding='utf-8') as f:
+        configs = expand_configs(json.load(f), os.getenv('countries_filename'))
+    for config in configs:
+        config['countries'] = load_weights(config['weights'])
+    sweep_folder = output_path(output_filename, 'sweep')
+    os.makedirs(sweep_folder, exist_ok=True)
+    with CsvStreamWriter(os.path.join(sweep_folder, 'index.csv'), ['N', 'vol_k', 'dif_k', 'weights', 'filename'],
+                         decimal_comma=True) as index_writer:
+        for n, (config, totals) in enumerate(zip(configs, sweep_totals(matrix, configs)), 1):
+            filename = os.path.join(sweep_folder, f'{n}.csv')
+            write_summary(filename, matrix, totals, top)
+            weights = config['weights']
+            index_writer.writerow({'N': n, 'vol_k': config['vol_k'], 'dif_k': config['dif_k'],
+                                   'weights': weights if isinstance(weights, str) else json.dumps(
+                                       weights, ensure_ascii=False), 'filename': filename})
+    print(f'{len(configs)} configurations -> {sweep_folder}\nOK')
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    parser = ArgumentParser(description='Подсчёт Total_Score сразу для набора коэффициентов')
+    parser.add_argument('config', help='JSON со списком "configs" или сеткой "vol_k", "dif_k", "weights"')
+    parser.add_argument('--matrix', help='файл с сохранёнными данными (по умолчанию <output>_matrix.json)')
+    parser.add_argument('--top', type=int, help='сколько запросов оставлять в каждом рейтинге')
+    args = parser.parse_args()
+    main(args.config, args.matrix, args.top)
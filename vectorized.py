@@ -0,0 +1,43 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from scoring import KeywordIndex
+
+
+def load_matrices(queries: list, index: KeywordIndex, countries: dict):
+    volumes, difficulties = [], []
+    for query in queries:
+        vols, difs, max_dif = index.get(query)
+        volumes.append([vols.get(country, 0) for country in countries])
+        difficulties.append([difs.get(country, max_dif) for country in countries])
+    shape = (len(queries), len(countries))
+    return (np.array(volumes, dtype=np.int64).reshape(shape),
+            np.array(difficulties, dtype=np.int64).reshape(shape))
+
+
+def score_phrases(queries: list, index: KeywordIndex, countries: dict, vol_k: float, dif_k: float):
+    if np is None:
+        raise ImportError('Для векторного подсчёта необходимо установить numpy')
+    volumes, difficulties = load_matrices(queries, index, countries)
+    volumes = np.where((volumes >= 1) & (volumes <= 10), 1, volumes)
+    max_vols = np.array([index.get_max_vol(country) for country in countries], dtype=np.float64)
+    norm_vols = np.zeros(volumes.shape, dtype=np.float64)
+    np.divide(volumes, max_vols, out=norm_vols, where=max_vols != 0)
+    norm_vols *= 100
+    # Same operand order as the per-row path so that the floats match bit for bit
+    scores = vol_k * norm_vols * dif_k * (100 - difficulties)
+    totals = np.zeros(len(queries), dtype=np.float64)
+    for j, weight in enumerate(countries.values()):
+        totals = totals + weight * scores[:, j]
+    rows = []
+    for query, vols, difs, score, total in zip(queries, volumes.tolist(), difficulties.tolist(),
+                                               scores.tolist(), totals.tolist()):
+        row = {'Запрос': query}
+        row.update((f'Volume_{country}', v) for country, v in zip(countries, vols))
+        row.update((f'Difficulty_{country}', d) for country, d in zip(countries, difs))
+        row.update((f'Score_{country}', s) for country, s in zip(countries, score))
+        row['Total_Score'] = total
+        rows.append(row)
+    return rows
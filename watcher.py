@@ -0,0 +1,102 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import time
+
+from constants import DOWNLOAD_TIMEOUT, DOWNLOAD_POLL_INTERVAL, DOWNLOAD_MAX_POLL_INTERVAL
+from exceptions import DownloadTimeoutException
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+def _inotify_watch(folder: str):
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(folder), WATCH_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class FolderWatcher:
+    # Blocks until something happens in the folder: inotify on Linux, polling with backoff elsewhere
+    def __init__(self, folder: str, poll_interval: float = DOWNLOAD_POLL_INTERVAL,
+                 max_poll_interval: float = DOWNLOAD_MAX_POLL_INTERVAL):
+        self.folder = folder
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.delay = poll_interval
+        self.fd = _inotify_watch(folder)
+
+    def wait(self, timeout: float):
+        if timeout <= 0:
+            return False
+        if self.fd is None:
+            time.sleep(min(self.delay, timeout))
+            self.delay = min(self.delay * 2, self.max_poll_interval)
+            return True
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def reset(self):
+        self.delay = self.poll_interval
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def wait_for_download(folder: str, old_files: set, is_complete=None, timeout: float = DOWNLOAD_TIMEOUT):
+    deadline = time.time() + timeout
+    # filename -> size at which is_complete was False: the file is only checked again once it changes
+    sizes, incomplete = dict(), dict()
+    with FolderWatcher(folder) as watcher:
+        while True:
+            for filename in set(os.listdir(folder)).difference(old_files):
+                if filename.endswith('.tmp') or filename.endswith('.crdownload'):
+                    continue
+                path = os.path.join(folder, filename)
+                try:
+                    size = os.path.getsize(path)
+                    # The file is considered finished once its size stops changing between two checks
+                    if size and sizes.get(filename) == size and incomplete.get(filename) != size:
+                        if is_complete is None or is_complete(path):
+                            return path
+                        incomplete[filename] = size
+                except OSError:
+                    continue
+                if sizes.get(filename) != size:
+                    watcher.reset()
+                sizes[filename] = size
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise DownloadTimeoutException(f'Файл не был загружен в {folder} за {timeout} с')
+            watcher.wait(min(remaining, watcher.poll_interval) if sizes else remaining)
@@ -0,0 +1,65 @@
+import os
+from csv import writer as csv_writer
+from io import StringIO
+
+
+def format_decimal(value):
+    return str(value).replace('.', ',') if isinstance(value, float) else value
+
+
+class CsvStreamWriter:
+    def __init__(self, filename: str, fieldnames: list, delimiter: str = ';', decimal_comma: bool = False,
+                 flush_rows: int = None, flush_bytes: int = None, mode: str = 'w', write_header: bool = True,
+                 atomic: bool = False):
+        # An atomic writer fills <filename>.tmp and moves it over filename only once it's closed successfully
+        self.filename = filename
+        self.atomic = atomic
+        self.fieldnames = list(fieldnames)
+        self.decimal_comma = decimal_comma
+        self.flush_rows = flush_rows or int(os.getenv('flush_rows', 1000))
+        self.flush_bytes = flush_bytes or int(os.getenv('flush_bytes', 1 << 20))
+        self.file = open(f'{filename}.tmp' if atomic else filename, mode, newline='', encoding='utf-8')
+        self.buffer = StringIO()
+        self.writer = csv_writer(self.buffer, delimiter=delimiter)
+        self.pending_rows = 0
+        self.rows_written = 0
+        if write_header:
+            self.writer.writerow(self.fieldnames)
+            self.flush()
+
+    def writerow(self, row: dict):
+        values = [row.get(key) for key in self.fieldnames]
+        if self.decimal_comma:
+            values = [format_decimal(value) for value in values]
+        self.writer.writerow(values)
+        self.pending_rows += 1
+        self.rows_written += 1
+        if self.pending_rows >= self.flush_rows or self.buffer.tell() >= self.flush_bytes:
+            self.flush()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def flush(self):
+        self.file.write(self.buffer.getvalue())
+        self.file.flush()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.pending_rows = 0
+
+    def close(self, commit: bool = True):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+            if self.atomic:
+                if commit:
+                    os.replace(f'{self.filename}.tmp', self.filename)
+                else:
+                    os.remove(f'{self.filename}.tmp')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(exc_type is None)